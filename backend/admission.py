@@ -0,0 +1,309 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_CONCURRENCY_PER_USER = int(os.getenv("LLM_MAX_CONCURRENCY_PER_USER", "2"))
+# Provider token budget per minute for this process; 0 disables the budget.
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+
+CHARS_PER_TOKEN = 4
+QUEUE_POLL_SECONDS = 1.0
+INITIAL_CALL_SECONDS = 5.0
+RATE_LIMIT_PAUSE_SECONDS = 5.0
+
+
+def estimate_tokens(text: str, max_output_tokens: int = 0) -> int:
+    return len(text or "") // CHARS_PER_TOKEN + max_output_tokens
+
+
+def _retry_after(error: Exception):
+    """Seconds to hold off when error is a provider rate limit (HTTP 429), else None."""
+    if getattr(error, "status_code", None) != 429:
+        return None
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return RATE_LIMIT_PAUSE_SECONDS
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class _Waiter:
+    def __init__(self, user_id, tokens: int, loop=None):
+        self.user_id = user_id
+        self.tokens = tokens
+        self.granted = False
+        self.enqueued = time.monotonic()
+        self.loop = loop
+        self.future = loop.create_future() if loop is not None else None
+        self.event = threading.Event() if loop is None else None
+
+    def grant(self):
+        self.granted = True
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+        else:
+            self.event.set()
+
+
+class Permit:
+    """Admission of one LLM call. Set used_tokens from the response's usage to settle the estimate."""
+
+    def __init__(self, governor, user_id, tokens: int):
+        self.governor = governor
+        self.user_id = user_id
+        self.tokens = tokens
+        self.used_tokens = None
+        self.started = time.monotonic()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.governor._release(self)
+
+
+class LLMGovernor:
+    """
+    Process-wide admission control for LLM calls.
+
+    A call runs once fewer than max_concurrency calls are running, fewer than
+    max_per_user of them for its user, and the token bucket (refilled at
+    tokens_per_minute) covers its estimated size. Callers that have to wait
+    queue per user, and users are served round robin, so one user's burst
+    does not hold everyone else back. A 429 from the provider pauses all
+    admissions for the time it asks for, instead of letting every caller
+    retry into the limit.
+
+    Works from the event loop (admit) and from threads (admit_sync). Waiting
+    async callers are told their queue position and estimated wait.
+    """
+
+    def __init__(self, max_concurrency: int, max_per_user: int, tokens_per_minute: int):
+        self.max_concurrency = max_concurrency
+        self.max_per_user = max_per_user
+        self.tokens_per_minute = tokens_per_minute
+        self.call_seconds = INITIAL_CALL_SECONDS  # moving average, for wait estimates
+        self.active = 0
+        self._active_by_user = {}
+        self._queues = OrderedDict()  # user -> deque of waiters, in round-robin order
+        self._tokens = float(tokens_per_minute)
+        self._refilled = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.queued = 0
+        self.abandoned = 0
+        self.rate_limited = 0
+        self.max_queue_seconds = 0.0
+
+    # ---- Under self._lock ----
+
+    def _refill(self, now: float):
+        if self.tokens_per_minute:
+            self._tokens = min(
+                float(self.tokens_per_minute),
+                self._tokens + (now - self._refilled) * self.tokens_per_minute / 60,
+            )
+        self._refilled = now
+
+    def _admit(self, waiter: _Waiter, now: float):
+        self.active += 1
+        self._active_by_user[waiter.user_id] = self._active_by_user.get(waiter.user_id, 0) + 1
+        self._tokens -= waiter.tokens
+        self.admitted += 1
+        self.max_queue_seconds = max(self.max_queue_seconds, now - waiter.enqueued)
+        waiter.grant()
+
+    def _dispatch(self):
+        now = time.monotonic()
+        self._refill(now)
+        while self._queues and self.active < self.max_concurrency and now >= self._paused_until:
+            for user_id, queue in self._queues.items():
+                if self._active_by_user.get(user_id, 0) < self.max_per_user:
+                    break
+            else:
+                return
+            waiter = queue[0]
+            # The head waits for tokens rather than being overtaken by smaller calls.
+            if self.tokens_per_minute and self._tokens < min(waiter.tokens, self.tokens_per_minute):
+                return
+            queue.popleft()
+            if queue:
+                self._queues.move_to_end(user_id)
+            else:
+                del self._queues[user_id]
+            self._admit(waiter, now)
+
+    def _enqueue(self, waiter: _Waiter):
+        self._queues.setdefault(waiter.user_id, deque()).append(waiter)
+        self._dispatch()
+        if not waiter.granted:
+            self.queued += 1
+
+    def _abandon(self, waiter: _Waiter):
+        if waiter.granted:
+            # Admitted just as the caller gave up.
+            self._release_locked(waiter.user_id, waiter.tokens, None, None)
+            return
+        queue = self._queues.get(waiter.user_id)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[waiter.user_id]
+        self.abandoned += 1
+        self._dispatch()
+
+    def _release_locked(self, user_id, tokens: int, used_tokens, seconds):
+        self.active -= 1
+        remaining = self._active_by_user.get(user_id, 1) - 1
+        if remaining:
+            self._active_by_user[user_id] = remaining
+        else:
+            self._active_by_user.pop(user_id, None)
+        if used_tokens is not None and self.tokens_per_minute:
+            self._tokens = min(float(self.tokens_per_minute), self._tokens + tokens - used_tokens)
+        if seconds is not None:
+            self.call_seconds = 0.8 * self.call_seconds + 0.2 * seconds
+        self._dispatch()
+
+    def _estimate(self, waiter: _Waiter):
+        """Queue position (1 = next) and estimated seconds until admission."""
+        own = self._queues.get(waiter.user_id, ())
+        k = own.index(waiter) if waiter in own else 0
+        ahead = k
+        mine = list(self._queues).index(waiter.user_id) if waiter.user_id in self._queues else 0
+        for i, (user_id, queue) in enumerate(self._queues.items()):
+            if user_id != waiter.user_id:
+                # Round robin: users before ours in the rotation get one more turn.
+                ahead += min(len(queue), k + (1 if i < mine else 0))
+
+        # Slots free up at max_concurrency (or max_per_user) calls per call_seconds.
+        wait = max(
+            (ahead + 1) * self.call_seconds / self.max_concurrency,
+            (k + 1) * self.call_seconds / self.max_per_user,
+        )
+        if self.tokens_per_minute:
+            needed = (ahead + 1) * waiter.tokens - self._tokens
+            wait = max(wait, needed * 60 / self.tokens_per_minute)
+        wait = max(wait, self._paused_until - time.monotonic())
+        return ahead + 1, round(max(wait, 0.0), 1)
+
+    # ---- Public ----
+
+    def _release(self, permit: Permit):
+        with self._lock:
+            self._release_locked(
+                permit.user_id, permit.tokens, permit.used_tokens, time.monotonic() - permit.started
+            )
+
+    def rate_limited_for(self, seconds: float):
+        """Hold all admissions for `seconds` after the provider rate-limited a call."""
+        with self._lock:
+            self.rate_limited += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, user_id, tokens: int, on_wait=None) -> Permit:
+        """
+        Wait for admission on the event loop. on_wait(position, estimated_wait)
+        is called when the call has to queue, when its position changes, and
+        with position 0 once it is admitted.
+        """
+        waiter = _Waiter(user_id, tokens, asyncio.get_running_loop())
+        with self._lock:
+            self._enqueue(waiter)
+        notified = None
+        try:
+            while not waiter.granted:
+                with self._lock:
+                    self._dispatch()
+                    if waiter.granted:
+                        break
+                    position, wait = self._estimate(waiter)
+                if on_wait is not None and position != notified:
+                    on_wait(position, wait)
+                    notified = position
+                try:
+                    await asyncio.wait_for(asyncio.shield(waiter.future), QUEUE_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            with self._lock:
+                self._abandon(waiter)
+            raise
+        if notified is not None and on_wait is not None:
+            on_wait(0, 0.0)
+        return Permit(self, user_id, tokens)
+
+    def acquire_sync(self, user_id, tokens: int) -> Permit:
+        """Blocking acquire for threadpool routes and Celery tasks."""
+        waiter = _Waiter(user_id, tokens)
+        with self._lock:
+            self._enqueue(waiter)
+        try:
+            while not waiter.event.wait(QUEUE_POLL_SECONDS):
+                with self._lock:
+                    self._dispatch()
+        except BaseException:
+            with self._lock:
+                self._abandon(waiter)
+            raise
+        return Permit(self, user_id, tokens)
+
+    def _settle(self, error: Exception):
+        seconds = _retry_after(error)
+        if seconds is not None:
+            self.rate_limited_for(seconds)
+
+    @asynccontextmanager
+    async def admit(self, user_id, tokens: int, on_wait=None):
+        permit = await self.acquire(user_id, tokens, on_wait)
+        try:
+            yield permit
+        except Exception as e:
+            self._settle(e)
+            raise
+        finally:
+            permit.release()
+
+    @contextmanager
+    def admit_sync(self, user_id, tokens: int):
+        permit = self.acquire_sync(user_id, tokens)
+        try:
+            yield permit
+        except Exception as e:
+            self._settle(e)
+            raise
+        finally:
+            permit.release()
+
+    def stats(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "active": self.active,
+                "max_concurrency": self.max_concurrency,
+                "max_concurrency_per_user": self.max_per_user,
+                "waiting": sum(len(queue) for queue in self._queues.values()),
+                "waiting_users": len(self._queues),
+                "tokens_per_minute": self.tokens_per_minute or None,
+                "tokens_available": int(self._tokens) if self.tokens_per_minute else None,
+                "paused_seconds": round(max(self._paused_until - time.monotonic(), 0.0), 1),
+                "average_call_seconds": round(self.call_seconds, 2),
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "abandoned": self.abandoned,
+                "rate_limited": self.rate_limited,
+                "max_queue_seconds": round(self.max_queue_seconds, 2),
+            }
+
+
+llm_governor = LLMGovernor(LLM_MAX_CONCURRENCY, LLM_MAX_CONCURRENCY_PER_USER, LLM_TOKENS_PER_MINUTE)
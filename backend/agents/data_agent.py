@@ -1,43 +1,216 @@
+import json
 import os
-import pandas as pd
+from functools import lru_cache
 from typing import Annotated, Sequence, TypedDict
 
+import httpx
+import pandas as pd
 from langchain_groq import ChatGroq
 from langchain_core.messages import BaseMessage
-from langchain_experimental.tools.python.tool import PythonAstREPLTool
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import StructuredTool
 from langgraph.graph import StateGraph, END
 from langgraph.prebuilt import ToolNode
+from pydantic import BaseModel, Field
+
+from backend.admission import estimate_tokens, llm_governor
+from backend.ai import GROQ_BASE_URL
+from backend.agents.sessions import ReplSession
+from backend.agents.tool_output import bound_output
+from backend.query import QueryError, QuerySpec, run_query
+
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+DATASET_BRIEF_TOKENS = int(os.getenv("DATASET_BRIEF_TOKENS", "1200"))
+BRIEF_SAMPLE_ROWS = 3
+BRIEF_VALUE_CHARS = 40
+# Expected size of one agent reply, for the admission token budget.
+LLM_REPLY_TOKENS = 1024
+
 
 class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], "The messages in the conversation"]
 
-def create_graph(df: pd.DataFrame):
+
+class PythonInput(BaseModel):
+    query: str = Field(description="code snippet to run")
+
+
+def _session(config: RunnableConfig):
+    """Per-conversation context the agent runs with, passed in config["configurable"]."""
+    return config["configurable"]
+
+
+def _bounded(output: str, tool_name: str, config: RunnableConfig):
+    session = _session(config)
+    upload = session.get("upload")
+    return bound_output(
+        output,
+        tool_name,
+        user_id=session.get("user_id"),
+        upload_id=upload.id if upload is not None else None,
+    )
+
+
+def create_python_tool():
+    def python_interpreter(query: str, config: RunnableConfig):
+        return _bounded(_session(config)["repl"].run(query), "python_interpreter", config)
+
+    return StructuredTool.from_function(
+        func=python_interpreter,
+        name="python_interpreter",
+        description=(
+            "A Python shell. Use this to execute python commands. "
+            "The dataframe is available as 'df'. "
+            "Variables you define persist across turns of this conversation, so reuse earlier results. "
+            "ALWAYS print the final result using `print(...)` so I can see it. "
+            "You can also search the web by running: "
+            "`from ddgs import DDGS; print(DDGS().text('your query', max_results=3))`"
+        ),
+        args_schema=PythonInput,
+        response_format="content_and_artifact",
+    )
+
+
+def create_query_tool():
     """
-    Creates a LangGraph agent capable of analyzing the provided DataFrame.
+    Tool that answers filter / group-by / aggregate questions with the
+    server-side query engine instead of computing them on the full frame.
     """
-    
-    llm = ChatGroq(
-        temperature=0,
-        model_name="llama-3.3-70b-versatile", 
-        api_key=os.environ.get("GROQ_API_KEY")
+    def query_dataset(config: RunnableConfig, **spec):
+        upload = _session(config).get("upload")
+        if upload is None:
+            return "Server-side queries are not available for this dataset; use python_interpreter.", None
+        try:
+            result = run_query(upload, **QuerySpec(**spec).model_dump())
+        except QueryError as e:
+            return f"Invalid query: {e}", None
+        return _bounded(json.dumps(result, default=str), "query_dataset", config)
+
+    return StructuredTool.from_function(
+        func=query_dataset,
+        name="query_dataset",
+        description=(
+            "Run a declarative query on the dataset: filter rows (where), select columns, "
+            "group_by with aggregates (count, sum, mean, min, max, count_distinct, stddev, variance), "
+            "order_by and limit. Prefer this over python for sums, counts, averages and top-N questions; "
+            "it only returns the small result set."
+        ),
+        args_schema=QuerySpec,
+        response_format="content_and_artifact",
     )
 
-    python_tool = PythonAstREPLTool(locals={"df": df})
-    python_tool.name = "python_interpreter"
-    python_tool.description = (
-        "A Python shell. Use this to execute python commands. "
-        "The dataframe is available as 'df'. "
-        "ALWAYS print the final result using `print(...)` so I can see it. "
-        "You can also search the web by running: "
-        "`from ddgs import DDGS; print(DDGS().text('your query', max_results=3))`"
+
+def _brief_value(value) -> str:
+    text = "" if value is None else str(value)
+    return text if len(text) <= BRIEF_VALUE_CHARS else text[: BRIEF_VALUE_CHARS - 3] + "..."
+
+
+def _brief_number(value) -> str:
+    return f"{value:.6g}" if isinstance(value, float) else str(value)
+
+
+def _brief_column(summary: dict, column: str) -> str:
+    rows = summary["shape"]["rows"] or 1
+    missing = summary.get("missing_values", {}).get(column, 0)
+    stats = summary.get("stats", {}).get(column, {})
+    parts = [str(summary.get("data_types", {}).get(column, "unknown"))]
+    if missing:
+        parts.append(f"{missing / rows:.1%} null")
+    if "mean" in stats:
+        parts.append(
+            f"min {_brief_number(stats.get('min'))}, mean {_brief_number(stats.get('mean'))}, "
+            f"max {_brief_number(stats.get('max'))}"
+        )
+    elif "unique" in stats:
+        part = f"~{stats['unique']} distinct"
+        if stats.get("top") is not None:
+            part += f", top {_brief_value(stats['top'])!r} ({stats.get('freq')}x)"
+        parts.append(part)
+    return f"- {column}: {', '.join(parts)}"
+
+
+def build_dataset_brief(summary: dict, max_tokens: int = DATASET_BRIEF_TOKENS) -> str:
+    """
+    Compact overview of a dataset for the system prompt, from its stored
+    profiling summary: shape, column types, null rates, value ranges or top
+    values, and a few sample rows. It saves the agent the df.head() /
+    df.info() round trips it otherwise starts every conversation with.
+
+    Sample rows go first and then column details when the text exceeds
+    max_tokens (estimated at four characters per token).
+    """
+    columns = summary.get("columns", [])
+    header = (
+        # No filename: answers to opening questions are cached by content and
+        # replayed to other users who uploaded the same data.
+        f"You are analyzing a dataset of {summary['shape']['rows']:,} rows x "
+        f"{summary['shape']['columns']} columns, loaded as `df`. "
+        "Use this overview instead of calling df.head(), df.info() or df.columns; "
+        "use the tools for anything beyond it."
+    )
+    column_lines = [_brief_column(summary, column) for column in columns]
+    samples = summary.get("sample_data", [])[:BRIEF_SAMPLE_ROWS]
+    sample_lines = [",".join(columns)] + [
+        ",".join(_brief_value(row.get(column)) for column in columns) for row in samples
+    ]
+    budget = max_tokens * 4
+
+    def render(n_columns: int, n_samples: int) -> str:
+        text = f"{header}\n\nColumns (type, nulls, range or top value):\n" + "\n".join(column_lines[:n_columns])
+        if n_columns < len(columns):
+            more = ", ".join(columns[n_columns:])
+            if len(more) > budget // 3:
+                more = more[: budget // 3].rsplit(", ", 1)[0] + ", ..."
+            text += f"\n- ... {len(columns) - n_columns} more: {more}"
+        if n_samples:
+            text += f"\n\nFirst {n_samples} rows:\n" + "\n".join(sample_lines[: n_samples + 1])
+        return text
+
+    for n_samples in range(len(samples), -1, -1):
+        text = render(len(columns), n_samples)
+        if len(text) <= budget:
+            return text
+    n_columns = len(columns)
+    while n_columns > 0 and len(render(n_columns, 0)) > budget:
+        n_columns -= 1
+    return render(n_columns, 0)[:budget]
+
+
+@lru_cache(maxsize=1)
+def get_llm() -> ChatGroq:
+    """
+    The process-wide chat model. Its HTTP clients keep a pool of connections
+    to the API open, so messages after the first skip TCP/TLS setup.
+    """
+    limits = httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS)
+    return ChatGroq(
+        temperature=0,
+        model_name="llama-3.3-70b-versatile",
+        api_key=os.environ.get("GROQ_API_KEY"),
+        base_url=GROQ_BASE_URL,
+        http_client=httpx.Client(limits=limits, timeout=LLM_TIMEOUT),
+        http_async_client=httpx.AsyncClient(limits=limits, timeout=LLM_TIMEOUT),
     )
 
-    tools = [python_tool]
-    llm_with_tools = llm.bind_tools(tools)
 
-    def chatbot(state: AgentState):
+@lru_cache(maxsize=1)
+def get_agent():
+    """
+    The compiled agent graph, built once per process. It holds no dataset:
+    tools read the conversation's REPL session and upload from
+    config["configurable"] at call time (see create_graph).
+    """
+    tools = [create_python_tool(), create_query_tool()]
+    llm_with_tools = get_llm().bind_tools(tools)
+
+    async def chatbot(state: AgentState, config: RunnableConfig):
         messages = state["messages"]
-        response = llm_with_tools.invoke(messages)
+        session = _session(config)
+        tokens = estimate_tokens("".join(str(message.content) for message in messages), LLM_REPLY_TOKENS)
+        async with llm_governor.admit(session.get("user_id"), tokens, session.get("on_queue")) as permit:
+            response = await llm_with_tools.ainvoke(messages)
+            permit.used_tokens = (getattr(response, "usage_metadata", None) or {}).get("total_tokens")
         return {"messages": [response]}
 
     tool_node = ToolNode(tools)
@@ -62,5 +235,23 @@ def create_graph(df: pd.DataFrame):
     )
     workflow.add_edge("tools", "chatbot")
 
-    app = workflow.compile()
-    return app
+    return workflow.compile()
+
+
+def create_graph(
+    df: pd.DataFrame = None, upload=None, session: ReplSession = None, user_id: int = None, on_queue=None
+):
+    """
+    The shared agent bound to one conversation. Cheap: nothing is compiled or
+    connected here. Pass a persistent REPL session to keep the agent's
+    variables between turns; otherwise a fresh one is made around df. When
+    the upload is given, the agent can also query it server-side, and with
+    the user, oversized tool output is kept as a fetchable artifact.
+    on_queue(position, estimated_wait) is called while a model call waits
+    for admission (see backend.admission).
+    """
+    if session is None:
+        session = ReplSession(df)
+    return get_agent().with_config(
+        configurable={"repl": session, "upload": upload, "user_id": user_id, "on_queue": on_queue}
+    )
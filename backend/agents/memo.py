@@ -0,0 +1,211 @@
+import ast
+import hashlib
+import os
+import threading
+
+import pandas as pd
+
+from backend.datasets import artifact_dir
+from backend.storage import tmp_path_for
+
+MEMO_DIR_NAME = "code_memo"
+CODE_MEMO_MAX_ENTRIES = int(os.getenv("CODE_MEMO_MAX_ENTRIES", "256"))
+CODE_MEMO_MAX_CHARS = 200_000
+# Bump when execution semantics change (e.g. run_code output format).
+MEMO_VERSION = "1"
+
+# Callables that neither depend on session state nor have side effects.
+SAFE_FUNCTIONS = {
+    "print", "len", "round", "sorted", "list", "dict", "tuple", "set", "str", "repr",
+    "int", "float", "bool", "sum", "min", "max", "abs", "range", "enumerate", "zip", "type",
+}
+# Methods that change their object even without inplace=True.
+MUTATING_METHODS = {"insert", "pop", "update", "__setitem__", "__delitem__", "__setattr__"}
+# Methods whose result depends on more than their inputs, or that draw plots.
+IMPURE_METHODS = {"sample", "plot", "hist", "boxplot", "show", "savefig"}
+# Methods whose string argument can read session variables as "@name".
+EXPRESSION_METHODS = {"query", "eval"}
+
+
+def memo_dir_for(upload) -> str:
+    return os.path.join(artifact_dir(upload), MEMO_DIR_NAME)
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """
+    Shape and column types of a session's `df`. The typed Arrow copy and the
+    CSV fallback load the same bytes with different dtypes, so the same code
+    can print different output depending on which one a session got.
+    """
+    return repr((df.shape, [(str(column), str(dtype)) for column, dtype in df.dtypes.items()]))
+
+
+def fingerprint(tree: ast.Module, frame: str = "") -> str:
+    """Hash of the code's AST and the frame it runs on: formatting, comments and quoting do not matter."""
+    key = f"{MEMO_VERSION}|{pd.__version__}|{frame}|{ast.dump(tree)}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _root_name(node):
+    while isinstance(node, (ast.Attribute, ast.Subscript, ast.Call)):
+        node = node.func if isinstance(node, ast.Call) else node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
+def is_pure(tree: ast.Module) -> bool:
+    """
+    Whether the code is a side-effect-free read of `df`: expression
+    statements only, no names but `df` and SAFE_FUNCTIONS (also none inside
+    query/eval strings), no private attributes, no writes to files, no plots
+    and no randomness. Its output then depends only on the dataset and the
+    code.
+    """
+    if not tree.body or not all(isinstance(statement, ast.Expr) for statement in tree.body):
+        return False
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Lambda, ast.NamedExpr, ast.comprehension, ast.Await, ast.Yield, ast.YieldFrom)):
+            return False
+        if isinstance(node, ast.Name) and node.id != "df" and node.id not in SAFE_FUNCTIONS:
+            return False
+        if isinstance(node, ast.Attribute) and node.attr.startswith("_"):
+            return False
+        if isinstance(node, ast.Call):
+            keywords = {keyword.arg for keyword in node.keywords}
+            if keywords & {"inplace", "file", "buf", "path", "path_or_buf", None}:
+                return False
+            if isinstance(node.func, ast.Attribute):
+                method = node.func.attr
+                if method in MUTATING_METHODS or method in IMPURE_METHODS:
+                    return False
+                if method in EXPRESSION_METHODS and any(
+                    isinstance(arg, ast.Constant) and isinstance(arg.value, str) and "@" in arg.value
+                    for arg in [*node.args, *(keyword.value for keyword in node.keywords)]
+                ):
+                    return False
+                # to_csv(), to_string() ... return text; with a target they write a file.
+                if method.startswith("to_") and node.args:
+                    return False
+    return True
+
+
+def may_modify_df(tree: ast.Module) -> bool:
+    """
+    Conservative check for code that could change the session's `df`:
+    rebinding or aliasing it, assigning into it, inplace=True, mutating
+    methods on it, or passing it to a function that might mutate it.
+    Derived frames are safe to modify under copy-on-write.
+    """
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id == "df" and isinstance(node.ctx, (ast.Store, ast.Del)):
+            return True
+        if isinstance(node, (ast.Assign, ast.AugAssign, ast.AnnAssign, ast.Delete)):
+            targets = node.targets if isinstance(node, (ast.Assign, ast.Delete)) else [node.target]
+            if any(_root_name(target) == "df" for target in targets):
+                return True
+            value = getattr(node, "value", None)
+            if value is not None and any(
+                isinstance(item, ast.Name) and item.id == "df"
+                for item in ([value] + list(getattr(value, "elts", [])))
+            ):
+                return True
+        if isinstance(node, ast.Call):
+            if any(keyword.arg == "inplace" for keyword in node.keywords):
+                return True
+            if isinstance(node.func, ast.Attribute) and node.func.attr in MUTATING_METHODS \
+                    and _root_name(node.func.value) == "df":
+                return True
+            passes_df = any(
+                isinstance(arg, ast.Name) and arg.id == "df"
+                for arg in [*node.args, *(keyword.value for keyword in node.keywords)]
+            )
+            if passes_df and not (isinstance(node.func, ast.Name) and node.func.id in SAFE_FUNCTIONS):
+                return True
+    return False
+
+
+class CodeMemo:
+    """
+    Outputs of pure agent code, stored per dataset under its artifact
+    directory and shared by every process.
+
+    Invalidation: the directory belongs to the dataset's content hash, whose
+    bytes never change, and is deleted with it; keys include the pandas
+    version, MEMO_VERSION and the loaded frame's dtypes; sessions whose `df` may have been modified stop
+    using the memo (see ReplSession). Each dataset keeps at most max_entries
+    outputs, least recently used first out.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.bypassed = 0
+
+    def get(self, memo_dir: str, key: str):
+        path = os.path.join(memo_dir, key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                output = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return output
+
+    def put(self, memo_dir: str, key: str, output: str):
+        if len(output) > CODE_MEMO_MAX_CHARS:
+            return
+        path = os.path.join(memo_dir, key)
+        # Sessions may store the same key at once; each writes its own file.
+        tmp_path = tmp_path_for(path)
+        try:
+            os.makedirs(memo_dir, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(output)
+            os.replace(tmp_path, path)
+        except OSError:
+            # Only a cache: a failed store must not fail the tool call.
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self.stores += 1
+
+        try:
+            entries = [entry for entry in os.scandir(memo_dir) if not entry.name.endswith(".tmp")]
+            if len(entries) > self.max_entries:
+                entries.sort(key=lambda entry: entry.stat().st_mtime)
+                for entry in entries[: len(entries) - self.max_entries]:
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+        except OSError:
+            # Another process trimmed the directory concurrently.
+            pass
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "bypassed": self.bypassed,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "max_entries_per_dataset": self.max_entries,
+            }
+
+
+code_memo = CodeMemo(CODE_MEMO_MAX_ENTRIES)
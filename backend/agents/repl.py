@@ -0,0 +1,35 @@
+import ast
+import re
+from contextlib import redirect_stdout
+from io import StringIO
+
+
+def sanitize_code(code: str) -> str:
+    """Strip the markdown fences and leading whitespace models wrap code in."""
+    code = re.sub(r"^(\s|`)*(?i:python)?\s*", "", code)
+    return re.sub(r"(\s|`)*$", "", code)
+
+
+def run_code(code: str, namespace: dict) -> str:
+    """
+    Execute agent code against a namespace, like PythonAstREPLTool: every
+    statement runs, and the value of a trailing expression is returned,
+    or else whatever the code printed. Errors are returned as text so the
+    agent can correct itself.
+    """
+    output = StringIO()
+    try:
+        tree = ast.parse(sanitize_code(code))
+        body, last = tree.body[:-1], tree.body[-1:]
+        with redirect_stdout(output):
+            exec(compile(ast.Module(body, type_ignores=[]), "<agent>", "exec"), namespace)
+            if last and isinstance(last[0], ast.Expr):
+                value = eval(compile(ast.Expression(last[0].value), "<agent>", "eval"), namespace)
+            else:
+                exec(compile(ast.Module(last, type_ignores=[]), "<agent>", "exec"), namespace)
+                value = None
+    except Exception as e:
+        return f"{output.getvalue()}{type(e).__name__}: {e}"
+    if value is not None:
+        return f"{output.getvalue()}{value}"
+    return output.getvalue()
@@ -0,0 +1,205 @@
+import ast
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from backend.agents.memo import code_memo, fingerprint, frame_fingerprint, is_pure, may_modify_df
+from backend.agents.repl import run_code, sanitize_code
+
+REPL_MAX_SESSIONS = int(os.getenv("REPL_MAX_SESSIONS", "64"))
+REPL_SESSION_TTL = int(os.getenv("REPL_SESSION_TTL", "1800"))
+REPL_SESSION_MAX_BYTES = int(os.getenv("REPL_SESSION_MAX_BYTES", str(512 * 1024 ** 2)))
+
+
+def _size_of(value) -> int:
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    return sys.getsizeof(value)
+
+
+class ReplSession:
+    """
+    Python namespace of one conversation, kept between turns so the agent can
+    reuse frames, pivots and models it built earlier. Runs are serialized.
+
+    `df` is the shared dataset and does not count against the memory cap;
+    anything else the code leaves behind does. When the cap is exceeded the
+    largest variables are dropped and the agent is told which.
+
+    With a memo directory, pure reads of `df` (see memo.is_pure) are answered
+    from the dataset's code memo while `df` is still the pristine dataset,
+    keyed by the code and the frame's shape and dtypes.
+    """
+
+    def __init__(self, df: pd.DataFrame, max_bytes: int = REPL_SESSION_MAX_BYTES, memo_dir: str = None):
+        self.namespace = {"df": df}
+        self.max_bytes = max_bytes
+        self.memo_dir = memo_dir
+        self.df_pristine = True
+        self.bytes = 0
+        self.runs = 0
+        self.last_used = time.monotonic()
+        self._df = df
+        self._frame = frame_fingerprint(df) if memo_dir is not None else ""
+        self._sizes = {}  # name -> (id(value), size), so unchanged values are not re-measured
+        self._lock = threading.Lock()
+
+    @property
+    def pristine(self) -> bool:
+        """Nothing but the unchanged dataset in the namespace."""
+        return self.df_pristine and all(name == "df" or name.startswith("__") for name in self.namespace)
+
+    def _memo_key(self, tree):
+        if tree is None or self.memo_dir is None or not is_pure(tree):
+            return None
+        if not self.df_pristine:
+            code_memo.record_bypass()
+            return None
+        return fingerprint(tree, self._frame)
+
+    def run(self, code: str) -> str:
+        with self._lock:
+            self.runs += 1
+            self.last_used = time.monotonic()
+            try:
+                tree = ast.parse(sanitize_code(code))
+            except SyntaxError:
+                tree = None
+
+            memo_key = self._memo_key(tree)
+            if memo_key is not None:
+                output = code_memo.get(self.memo_dir, memo_key)
+                if output is not None:
+                    return output
+
+            try:
+                output = run_code(code, self.namespace)
+            finally:
+                # Also when interrupted part way (see tool_pool.cancel).
+                if memo_key is None and (
+                    (tree is not None and may_modify_df(tree)) or self.namespace.get("df") is not self._df
+                ):
+                    self.df_pristine = False
+            if memo_key is not None:
+                code_memo.put(self.memo_dir, memo_key, output)
+            dropped = self._enforce_memory_cap()
+        if dropped:
+            output += (
+                f"\n[Session memory limit reached: dropped {', '.join(dropped)}. "
+                "Recompute them if you still need them.]"
+            )
+        return output
+
+    def _measure(self):
+        sizes = {}
+        for name, value in self.namespace.items():
+            if name.startswith("__") or value is self._df:
+                continue
+            previous = self._sizes.get(name)
+            if previous and previous[0] == id(value):
+                sizes[name] = previous
+            else:
+                sizes[name] = (id(value), _size_of(value))
+        self._sizes = sizes
+        self.bytes = sum(size for _, size in sizes.values())
+
+    def _enforce_memory_cap(self):
+        self._measure()
+        dropped = []
+        for name, (_, size) in sorted(self._sizes.items(), key=lambda item: item[1][1], reverse=True):
+            if self.bytes <= self.max_bytes:
+                break
+            del self.namespace[name]
+            del self._sizes[name]
+            self.bytes -= size
+            dropped.append(name)
+        return dropped
+
+
+class ReplSessionManager:
+    """
+    Process-wide registry of REPL sessions keyed by (user_id, upload_id),
+    evicted after `ttl` seconds idle and least-recently-used beyond
+    `max_sessions`.
+    """
+
+    def __init__(self, max_sessions: int, ttl: int, max_session_bytes: int):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_session_bytes = max_session_bytes
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.evictions = {"ttl": 0, "lru": 0, "dropped": 0}
+
+    def _evict_expired(self, now: float):
+        expired = [key for key, session in self._sessions.items() if now - session.last_used > self.ttl]
+        for key in expired:
+            del self._sessions[key]
+            self.evictions["ttl"] += 1
+
+    def get(self, user_id: int, upload_id: int, load_df, memo_dir: str = None) -> ReplSession:
+        """The conversation's session; `load_df` is only called to start a new one."""
+        key = (user_id, upload_id)
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            session = self._sessions.get(key)
+            if session is not None:
+                self._sessions.move_to_end(key)
+                self.reused += 1
+                return session
+
+        session = ReplSession(load_df(), max_bytes=self.max_session_bytes, memo_dir=memo_dir)
+        with self._lock:
+            # Another request may have started the same session meanwhile.
+            existing = self._sessions.get(key)
+            if existing is not None:
+                self.reused += 1
+                return existing
+            self._sessions[key] = session
+            self.created += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions["lru"] += 1
+        return session
+
+    def is_pristine(self, user_id: int, upload_id: int) -> bool:
+        """Whether the conversation's session, if any, holds nothing but its dataset."""
+        with self._lock:
+            session = self._sessions.get((user_id, upload_id))
+        return session is None or session.pristine
+
+    def drop_upload(self, upload_id: int):
+        with self._lock:
+            for key in [key for key in self._sessions if key[1] == upload_id]:
+                del self._sessions[key]
+                self.evictions["dropped"] += 1
+
+    def stats(self):
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl,
+                "bytes": sum(session.bytes for session in self._sessions.values()),
+                "max_session_bytes": self.max_session_bytes,
+                "runs": sum(session.runs for session in self._sessions.values()),
+                "created": self.created,
+                "reused": self.reused,
+                "evictions": dict(self.evictions),
+                "code_memo": code_memo.stats(),
+            }
+
+
+repl_sessions = ReplSessionManager(REPL_MAX_SESSIONS, REPL_SESSION_TTL, REPL_SESSION_MAX_BYTES)
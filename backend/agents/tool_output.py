@@ -0,0 +1,54 @@
+import os
+import uuid
+
+from backend.database import SessionLocal
+from backend.models.tool_artifact import ToolArtifact
+
+TOOL_OUTPUT_MAX_CHARS = int(os.getenv("TOOL_OUTPUT_MAX_CHARS", "4000"))
+
+
+def store_artifact(user_id: int, upload_id: int, tool_name: str, content: str) -> str:
+    db = SessionLocal()
+    try:
+        artifact = ToolArtifact(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            upload_id=upload_id,
+            tool_name=tool_name,
+            content=content,
+            size=len(content),
+        )
+        db.add(artifact)
+        db.commit()
+        return artifact.id
+    finally:
+        db.close()
+
+
+def bound_output(output: str, tool_name: str, user_id: int = None, upload_id: int = None,
+                 max_chars: int = TOOL_OUTPUT_MAX_CHARS):
+    """
+    Fit a tool's output into the budget the chat stream and the model see.
+
+    Longer output keeps its head and tail around an omission note. When the
+    conversation is known, the full text is stored as a ToolArtifact that
+    GET /chat/artifacts/{id} pages through.
+
+    Returns:
+        (content, artifact): the text for the model, and None or
+        {"artifact_id", "total_chars"} (a tool's content_and_artifact result)
+    """
+    if len(output) <= max_chars:
+        return output, None
+
+    artifact_id = None
+    if user_id is not None and upload_id is not None:
+        artifact_id = store_artifact(user_id, upload_id, tool_name, output)
+
+    head = output[: max_chars * 3 // 4]
+    tail = output[len(output) - max_chars // 4:]
+    note = f"[{len(output) - len(head) - len(tail)} of {len(output)} characters omitted"
+    if artifact_id:
+        note += f"; full output saved as artifact {artifact_id}"
+    note += ". Print a smaller slice or a summary if you need the omitted part.]"
+    return f"{head}\n...\n{note}\n...\n{tail}", {"artifact_id": artifact_id, "total_chars": len(output)}
@@ -0,0 +1,326 @@
+import multiprocessing
+import os
+import resource
+import signal
+import threading
+import time
+from itertools import count
+from types import SimpleNamespace
+
+from backend.agents.memo import memo_dir_for
+from backend.agents.sessions import repl_sessions
+from backend.dataset_cache import get_dataframe
+
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", "2"))
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "60"))
+TOOL_CPU_SECONDS = int(os.getenv("TOOL_CPU_SECONDS", "30"))
+TOOL_WORKER_MAX_MEMORY = int(os.getenv("TOOL_WORKER_MAX_MEMORY", str(2 * 1024 ** 3)))
+WORKER_START_TIMEOUT = 60
+
+
+# ---- Worker process ----
+
+class _Cancelled(BaseException):
+    """Raised in a worker's code by cancel(); not an Exception, so agent code cannot swallow it."""
+
+
+_running = 0  # id of the run in progress, 0 when idle
+_cancel_run = None  # shared with the pool: id of the run cancel() targets
+
+
+def _interrupt(signum, frame):
+    # Only the run cancel() was aimed at is interrupted; an idle worker, or
+    # one that has moved on to another run, ignores late signals.
+    if _running and _running == _cancel_run.value:
+        raise _Cancelled()
+
+
+def _limit_cpu(seconds: int):
+    # RLIMIT_CPU counts the process's total CPU time, so the budget for this
+    # call is added to what has been used so far. Past it, SIGXCPU kills us.
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = int(usage.ru_utime + usage.ru_stime) + 1
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = used + seconds
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _worker_main(conn, max_memory: int, cancel_run):
+    global _running, _cancel_run
+    _cancel_run = cancel_run
+    signal.signal(signal.SIGUSR1, _interrupt)
+    if max_memory:
+        # RLIMIT_DATA covers the heap and anonymous mappings but not the
+        # read-only file mappings datasets are served from.
+        resource.setrlimit(resource.RLIMIT_DATA, (max_memory, max_memory))
+    conn.send("ready")
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        command = message[0]
+        if command == "run":
+            _, run_id, user_id, upload, code, cpu_seconds = message
+            _limit_cpu(cpu_seconds)
+            session = None
+            try:
+                upload = SimpleNamespace(**upload)
+                # The worker's own cache, keyed by dataset_version: sessions of
+                # different users on the same data share one frame.
+                session = repl_sessions.get(
+                    user_id, upload.id, lambda: get_dataframe(upload), memo_dir=memo_dir_for(upload)
+                )
+                _running = run_id
+                output = session.run(code)
+            except _Cancelled:
+                output = "Execution was cancelled."
+            except Exception as e:
+                output = f"{type(e).__name__}: {e}"
+            finally:
+                _running = 0
+            conn.send((output, session is None or session.pristine))
+        elif command == "drop":
+            repl_sessions.drop_upload(message[1])
+            conn.send(None)
+        elif command == "stats":
+            conn.send(repl_sessions.stats())
+
+
+# ---- Pool (API process side) ----
+
+class _Worker:
+    def __init__(self, context, max_memory: int):
+        self.conn, child_conn = context.Pipe()
+        self.cancel_run = context.Value("q", 0, lock=False)
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, max_memory, self.cancel_run), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.calls = 0
+        self.ready = False
+        self.running = None  # (user_id, upload_id, run_id) of the code being run
+        self.dirty = set()  # (user_id, upload_id) whose session holds more than the dataset
+
+    def wait_ready(self):
+        # Startup time (fork, imports) does not count against a call's timeout.
+        if not self.ready:
+            if not self.conn.poll(WORKER_START_TIMEOUT):
+                raise OSError("tool worker did not start")
+            self.ready = self.conn.recv() == "ready"
+
+    def stop(self):
+        self.conn.close()
+        self.process.kill()
+        self.process.join()
+
+
+class ToolWorkerPool:
+    """
+    Pre-forked processes that run the agent's Python code, so analysis work
+    cannot stall the API process.
+
+    Workers are forked from a forkserver that has pandas, pyarrow and the
+    dataset code imported. A conversation is pinned to one worker, which
+    keeps its REPL session; datasets are memory-mapped there. Each call gets
+    a CPU time budget and a wall clock timeout, and each worker a memory
+    limit. A worker that exceeds a limit or times out is killed and replaced;
+    the sessions it held are lost and the agent is told so.
+    """
+
+    def __init__(self, size: int, timeout: float, cpu_seconds: int, max_memory: int):
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.max_memory = max_memory
+        self.restarts = 0
+        self._context = multiprocessing.get_context("forkserver")
+        self._context.set_forkserver_preload(["backend.agents.tool_pool"])
+        self._workers = [_Worker(self._context, max_memory) for _ in range(size)]
+        self._locks = [threading.Lock() for _ in range(size)]
+        self._run_ids = count(1)
+
+    def _replace(self, index: int):
+        self._workers[index].stop()
+        self._workers[index] = _Worker(self._context, self.max_memory)
+        self.restarts += 1
+
+    def _index(self, user_id: int, upload_id: int) -> int:
+        return hash((user_id, upload_id)) % len(self._workers)
+
+    def run(self, user_id: int, upload, code: str) -> str:
+        upload_ref = {"id": upload.id, "content_hash": upload.content_hash, "filepath": upload.filepath}
+        index = self._index(user_id, upload.id)
+        # Waiting for another conversation pinned to the same worker counts
+        # against this call's timeout.
+        started = time.monotonic()
+        if not self._locks[index].acquire(timeout=self.timeout):
+            return (
+                f"Execution timed out after {self.timeout:g} seconds waiting for a busy Python worker. "
+                "The code did not run; earlier variables are kept."
+            )
+        remaining = max(self.timeout - (time.monotonic() - started), 0)
+        try:
+            worker = self._workers[index]
+            worker.calls += 1
+            try:
+                worker.wait_ready()
+                worker.running = (user_id, upload.id, next(self._run_ids))
+                worker.conn.send(("run", worker.running[2], user_id, upload_ref, code, self.cpu_seconds))
+                if worker.conn.poll(remaining):
+                    output, pristine = worker.conn.recv()
+                    if pristine:
+                        worker.dirty.discard((user_id, upload.id))
+                    else:
+                        worker.dirty.add((user_id, upload.id))
+                    return output
+                reason = f"Execution timed out after {self.timeout:g} seconds"
+            except (EOFError, OSError):
+                reason = (
+                    f"Execution was stopped for exceeding the CPU time ({self.cpu_seconds}s) "
+                    "or memory limit"
+                )
+            finally:
+                worker.running = None
+            self._replace(index)
+        finally:
+            self._locks[index].release()
+        return f"{reason}. The Python session was reset, so earlier variables are gone."
+
+    def cancel(self, user_id: int, upload_id: int):
+        """
+        Interrupt the conversation's code if it is running. The worker and
+        its sessions are kept; the run returns "Execution was cancelled.".
+        """
+        worker = self._workers[self._index(user_id, upload_id)]
+        running = worker.running
+        if running is not None and running[:2] == (user_id, upload_id):
+            # Tag the signal with the run id: if that run has already finished
+            # and the worker started another conversation's, it is ignored.
+            worker.cancel_run.value = running[2]
+            try:
+                os.kill(worker.process.pid, signal.SIGUSR1)
+            except ProcessLookupError:
+                pass
+
+    def pristine(self, user_id: int, upload_id: int) -> bool:
+        """Whether the conversation's session holds nothing but its dataset, as of its last run."""
+        return (user_id, upload_id) not in self._workers[self._index(user_id, upload_id)].dirty
+
+    def _broadcast(self, message, lock_timeout: float):
+        replies = []
+        for index, lock in enumerate(self._locks):
+            # Best effort: skip workers busy running code.
+            if not lock.acquire(timeout=lock_timeout):
+                continue
+            try:
+                worker = self._workers[index]
+                worker.wait_ready()
+                worker.conn.send(message)
+                if not worker.conn.poll(lock_timeout):
+                    # A late reply would be read as the answer to the next call.
+                    raise OSError("tool worker did not answer")
+                replies.append((worker, worker.conn.recv()))
+            except (EOFError, OSError):
+                self._replace(index)
+            finally:
+                lock.release()
+        return replies
+
+    def drop_upload(self, upload_id: int):
+        for worker, _ in self._broadcast(("drop", upload_id), lock_timeout=1):
+            worker.dirty = {key for key in worker.dirty if key[1] != upload_id}
+
+    def stats(self):
+        replies = self._broadcast(("stats",), lock_timeout=1)
+        return {
+            "workers": len(self._workers),
+            "restarts": self.restarts,
+            "timeout_seconds": self.timeout,
+            "cpu_seconds": self.cpu_seconds,
+            "max_memory": self.max_memory,
+            "worker_stats": [
+                {"pid": worker.process.pid, "calls": worker.calls, "sessions": sessions}
+                for worker, sessions in replies
+            ],
+        }
+
+    def shutdown(self):
+        for worker in self._workers:
+            worker.stop()
+
+
+class PooledReplSession:
+    """Handle to a conversation's REPL session held by a pool worker."""
+
+    def __init__(self, pool: ToolWorkerPool, user_id: int, upload):
+        self.pool = pool
+        self.user_id = user_id
+        self.upload = upload
+
+    def run(self, code: str) -> str:
+        return self.pool.run(self.user_id, self.upload, code)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def start_tool_pool():
+    """Start the worker pool; a no-op with TOOL_WORKERS=0, where code runs in-process."""
+    global _pool
+    with _pool_lock:
+        if _pool is None and TOOL_WORKERS > 0:
+            _pool = ToolWorkerPool(TOOL_WORKERS, TOOL_TIMEOUT, TOOL_CPU_SECONDS, TOOL_WORKER_MAX_MEMORY)
+    return _pool
+
+
+def stop_tool_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def open_repl_session(user_id: int, upload):
+    """The REPL session for a conversation: in a pool worker, or in-process without a pool."""
+    pool = start_tool_pool()
+    if pool is not None:
+        return PooledReplSession(pool, user_id, upload)
+    return repl_sessions.get(user_id, upload.id, lambda: get_dataframe(upload), memo_dir=memo_dir_for(upload))
+
+
+def repl_session_pristine(user_id: int, upload_id: int) -> bool:
+    """
+    Whether a conversation's REPL session holds nothing but its dataset. A
+    cancelled or failed turn is not saved but can leave variables behind.
+    """
+    pool = _pool
+    if pool is not None:
+        return pool.pristine(user_id, upload_id)
+    return repl_sessions.is_pristine(user_id, upload_id)
+
+
+def cancel_repl_run(user_id: int, upload_id: int):
+    """Interrupt code running for a conversation; only possible in the worker pool."""
+    pool = _pool
+    if pool is not None:
+        pool.cancel(user_id, upload_id)
+
+
+def drop_repl_sessions(upload_id: int):
+    pool = _pool
+    if pool is not None:
+        pool.drop_upload(upload_id)
+    repl_sessions.drop_upload(upload_id)
+
+
+def repl_session_stats():
+    pool = _pool
+    if pool is not None:
+        return pool.stats()
+    return repl_sessions.stats()
@@ -1,34 +1,52 @@
 from openai import OpenAI
+import json
 import os
 from dotenv import load_dotenv
 
+from backend.admission import estimate_tokens, llm_governor
+
 load_dotenv()
 
+# Point at bench/fake_llm.py to load test without spending quota.
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com").rstrip("/")
+
 client = OpenAI(
     api_key=os.environ.get("GROQ_API_KEY"),
-    base_url="https://api.groq.com/openai/v1",
+    base_url=f"{GROQ_BASE_URL}/openai/v1",
 )
 
-def call_groq_insights(prompt: str, model: str = "openai/gpt-oss-20b") -> str:
+def insights_prompt(summary_json: str) -> str:
+    # Leave the filename out: insights are shared by every upload of the same
+    # bytes. The sketch error bounds and top-value lists only cost tokens.
+    summary = json.loads(summary_json)
+    summary.pop("filename", None)
+    summary.pop("approximations", None)
+    return f"Analyze this dataset summary and give 3 key insights:\n{json.dumps(summary, indent=2)}"
+
+
+def call_groq_insights(prompt: str, model: str = "openai/gpt-oss-20b", user_id: int = None) -> str:
     """
     Generate insights using Groq's API with the OpenAI client.
     
     Args:
         prompt: The prompt to send to the model
         model: The model to use (defaults to gpt-oss-20b)
+        user_id: Whose request this is, for admission control
         
     Returns:
         str: The generated response text
     """
     try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are a data insights assistant. You must return your response as a valid JSON array of strings, where each string is a distinct insight. Do not include any markdown formatting or other text."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=500
-        )
+        with llm_governor.admit_sync(user_id, estimate_tokens(prompt, 500)) as permit:
+            response = client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": "You are a data insights assistant. You must return your response as a valid JSON array of strings, where each string is a distinct insight. Do not include any markdown formatting or other text."},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=500
+            )
+            permit.used_tokens = response.usage.total_tokens if response.usage else None
         return response.choices[0].message.content
     except Exception as e:
         raise Exception(f"Error calling Groq API: {str(e)}")
@@ -0,0 +1,89 @@
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from backend.models.upload import Upload
+
+ANSWER_CACHE_BYTES = int(os.getenv("ANSWER_CACHE_BYTES", str(64 * 1024 ** 2)))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "3600"))
+
+
+def normalize_question(question: str) -> str:
+    """Case, whitespace and trailing punctuation do not change the question."""
+    question = unicodedata.normalize("NFKC", question).casefold()
+    question = re.sub(r"\s+", " ", question).strip()
+    return question.rstrip(" ?!.")
+
+
+def answer_key(upload: Upload, question: str):
+    return (upload.content_hash or f"upload:{upload.id}", normalize_question(question))
+
+
+class AnswerCache:
+    """
+    Process-wide LRU cache of agent answers bounded by a byte budget and a
+    TTL. An entry is the SSE event sequence of the original answer, so a hit
+    is replayed exactly as it was streamed.
+    """
+
+    def __init__(self, max_bytes: int, ttl: int):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _remove(self, key):
+        _, _, _, size = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def get(self, key):
+        """(events, response) of a live entry, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, key, events, response: str):
+        size = len(response) + sum(len(event) + len(data) for event, data in events)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while self._entries and self.current_bytes + size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+            self._entries[key] = (time.monotonic() + self.ttl, list(events), response, size)
+            self.current_bytes += size
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else None,
+            }
+
+
+answer_cache = AnswerCache(ANSWER_CACHE_BYTES, ANSWER_CACHE_TTL)
@@ -4,7 +4,7 @@ celery_app = Celery(
     "ai_dash",
     broker="redis://localhost:6379/0",
     backend="redis://localhost:6379/1",
-    include=["backend.tasks.data_tasks"] 
+    include=["backend.tasks.data_tasks", "backend.tasks.chat_tasks"]
 )
 
 celery_app.conf.update(
@@ -0,0 +1,176 @@
+import os
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.admission import llm_governor
+from backend.ai import client
+from backend.models.chat import ChatMessage, ChatSummary
+
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "3000"))
+CHAT_SUMMARY_MAX_WORDS = int(os.getenv("CHAT_SUMMARY_MAX_WORDS", "250"))
+SUMMARY_MODEL = "openai/gpt-oss-20b"
+
+# Rough size of a token in English text; good enough for budgeting.
+CHARS_PER_TOKEN = 4
+PAGE_SIZE = 50
+SUMMARY_TURN_CHARS = 2000
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text or "") // CHARS_PER_TOKEN + 1
+
+
+def _clip(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars] + " [...]"
+
+
+def _turns(db: Session, user_id: int, upload_id: int):
+    return db.query(ChatMessage).filter(ChatMessage.upload_id == upload_id, ChatMessage.user_id == user_id)
+
+
+def select_window(db: Session, user_id: int, upload_id: int, budget: int = CHAT_HISTORY_TOKEN_BUDGET):
+    """
+    The most recent turns whose combined size fits the token budget, oldest
+    first. The latest turn is always included (clipped when building the
+    prompt). Turns are read newest first, a page at a time.
+    """
+    window = []
+    used = 0
+    before = None
+    while True:
+        query = _turns(db, user_id, upload_id)
+        if before is not None:
+            query = query.filter(ChatMessage.id < before)
+        page = query.order_by(ChatMessage.id.desc()).limit(PAGE_SIZE).all()
+        for record in page:
+            tokens = estimate_tokens(record.message) + estimate_tokens(record.response)
+            if window and used + tokens > budget:
+                return window[::-1]
+            window.append(record)
+            used += tokens
+        if len(page) < PAGE_SIZE:
+            return window[::-1]
+        before = page[-1].id
+
+
+def build_history(db: Session, user_id: int, upload_id: int, budget: int = CHAT_HISTORY_TOKEN_BUDGET):
+    """
+    Prompt history for the next question: the rolling summary of older turns
+    as a system message, then the recent turns that fit the budget. Its size
+    stays roughly constant however long the conversation gets.
+    """
+    messages = []
+    summary = db.query(ChatSummary).filter(
+        ChatSummary.user_id == user_id, ChatSummary.upload_id == upload_id
+    ).first()
+    if summary and summary.summary:
+        messages.append(SystemMessage(content=f"Summary of the earlier conversation:\n{summary.summary}"))
+
+    # Only a lone turn larger than the budget gets clipped: its message
+    # first, then its response to whatever budget is left.
+    remaining = budget
+    for record in select_window(db, user_id, upload_id, budget):
+        message = _clip(record.message, remaining)
+        remaining = max(remaining - estimate_tokens(message), 0)
+        messages.append(HumanMessage(content=message))
+        if record.response:
+            response = _clip(record.response, remaining)
+            remaining = max(remaining - estimate_tokens(response), 0)
+            messages.append(AIMessage(content=response))
+    return messages
+
+
+def _summarize(user_id: int, previous: str, turns) -> str:
+    transcript = "\n\n".join(
+        f"User: {turn.message[:SUMMARY_TURN_CHARS]}\nAssistant: {(turn.response or '')[:SUMMARY_TURN_CHARS]}"
+        for turn in turns
+    )
+    prompt = f"Existing summary:\n{previous or '(none)'}\n\nNew turns:\n{transcript}"
+    with llm_governor.admit_sync(user_id, estimate_tokens(prompt) + 1024) as permit:
+        response = client.chat.completions.create(
+            model=SUMMARY_MODEL,
+            messages=[
+                {"role": "system", "content": (
+                    "You maintain the running summary of a conversation between a user and a data analysis "
+                    "assistant about one dataset. Merge the new turns into the existing summary. Keep facts, "
+                    "numbers, column names, definitions and decisions the user may refer back to; drop "
+                    f"pleasantries. Answer with the updated summary only, at most {CHAT_SUMMARY_MAX_WORDS} words."
+                )},
+                {"role": "user", "content": prompt},
+            ],
+            max_tokens=1024,
+        )
+        permit.used_tokens = response.usage.total_tokens if response.usage else None
+    return response.choices[0].message.content or previous
+
+
+def _batches(turns, budget: int):
+    batch, used = [], 0
+    for turn in turns:
+        tokens = min(estimate_tokens(turn.message) + estimate_tokens(turn.response), budget)
+        if batch and used + tokens > budget:
+            yield batch
+            batch, used = [], 0
+        batch.append(turn)
+        used += tokens
+    if batch:
+        yield batch
+
+
+def compact_history(db: Session, user_id: int, upload_id: int, budget: int = CHAT_HISTORY_TOKEN_BUDGET):
+    """
+    Fold turns that have dropped out of the history window into the
+    conversation's rolling summary. A no-op when there are none; a backlog
+    is folded a budget's worth of turns per LLM call.
+
+    Returns:
+        ChatSummary | None
+    """
+    summary = db.query(ChatSummary).filter(
+        ChatSummary.user_id == user_id, ChatSummary.upload_id == upload_id
+    ).first()
+    window = select_window(db, user_id, upload_id, budget)
+    if not window:
+        return summary
+
+    covered = summary.covered_until_id if summary else 0
+    pending = (
+        _turns(db, user_id, upload_id)
+        .filter(ChatMessage.id > covered, ChatMessage.id < window[0].id)
+        .order_by(ChatMessage.id.asc())
+        .all()
+    )
+    if not pending:
+        return summary
+
+    text = summary.summary if summary else ""
+    for batch in _batches(pending, budget):
+        text = _summarize(user_id, text, batch)
+
+    if summary is None:
+        summary = ChatSummary(user_id=user_id, upload_id=upload_id, summary=text, covered_until_id=pending[-1].id)
+        db.add(summary)
+        try:
+            db.commit()
+        except IntegrityError:
+            # A concurrent compaction created the row first; its result stands.
+            db.rollback()
+            return None
+        return summary
+
+    # Only move the summary forward from the state it was folded from: a
+    # concurrent compaction that got there first already covers these turns.
+    updated = db.query(ChatSummary).filter(
+        ChatSummary.id == summary.id, ChatSummary.covered_until_id == covered
+    ).update({"summary": text, "covered_until_id": pending[-1].id}, synchronize_session=False)
+    if not updated:
+        db.rollback()
+        return None
+    db.commit()
+    db.refresh(summary)
+    return summary
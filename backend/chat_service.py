@@ -1,86 +1,244 @@
+import asyncio
 import json
+import logging
 import os
-from typing import Any, Dict, Optional, AsyncGenerator
+import time
+from contextlib import aclosing
+from typing import Any, Dict, Optional, AsyncGenerator, Tuple
 
-import pandas as pd
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.messages import HumanMessage, SystemMessage
 
 from backend.models.upload import Upload
 from backend.models.chat import ChatMessage
-from backend.agents.data_agent import create_graph
+from backend.models.summary import Summary
+from backend.agents.data_agent import build_dataset_brief, create_graph
+from backend.agents.tool_pool import cancel_repl_run, open_repl_session, repl_session_pristine
+from backend.answer_cache import answer_cache, answer_key
+from backend.chat_memory import build_history
+from backend.tasks.chat_tasks import compact_chat_memory
 
-async def stream_chat_process(db: Session, user_id: int, upload_id: int, user_question: str) -> AsyncGenerator[str, None]:
-    upload: Optional[Upload] = (
+logger = logging.getLogger(__name__)
+
+
+def _get_upload(db: Session, user_id: int, upload_id: int) -> Optional[Upload]:
+    upload = (
         db.query(Upload)
         .filter(Upload.id == upload_id, Upload.user_id == user_id)
         .first()
     )
+    if upload is not None and not os.path.exists(upload.filepath):
+        raise FileNotFoundError(upload.filepath)
+    return upload
+
+
+def _dataset_brief(db: Session, upload: Upload):
+    summary = db.query(Summary).filter(Summary.upload_id == upload.id).first()
+    if summary is None:
+        return None
+    try:
+        return build_dataset_brief(json.loads(summary.summary_json))
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning("Could not build dataset brief for upload %s: %s", upload.id, e)
+        return None
+
+
+def _save_turn(db: Session, user_id: int, upload_id: int, user_question: str, response: str) -> ChatMessage:
+    chat = ChatMessage(
+        user_id=user_id,
+        upload_id=upload_id,
+        message=user_question,
+        response=response,
+    )
+    db.add(chat)
+    db.commit()
+    db.refresh(chat)
+
+    try:
+        compact_chat_memory.delay(user_id, upload_id)
+    except Exception as e:
+        # The window still bounds the prompt; older turns just wait to be summarized.
+        logger.warning("Could not schedule chat memory compaction: %s", e)
+    return chat
+
+
+async def _agent_events(app, messages, notices: asyncio.Queue):
+    """
+    The agent's events as ("agent", event) pairs, interleaved with the
+    ("queue", (position, wait)) notices put on `notices` while a model call
+    waits for admission. The agent runs in its own task so notices get out
+    while it is blocked; closing this generator cancels that task.
+    """
+    async def run():
+        try:
+            async with aclosing(app.astream_events({"messages": messages}, version="v1")) as events:
+                async for event in events:
+                    await notices.put(("agent", event))
+        except Exception as e:
+            await notices.put(("failed", e))
+            return
+        await notices.put(("end", None))
+
+    task = asyncio.create_task(run())
+    try:
+        while True:
+            source, item = await notices.get()
+            if source == "end":
+                return
+            if source == "failed":
+                raise item
+            yield source, item
+    finally:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+async def stream_chat_process(
+    db: Session, user_id: int, upload_id: int, user_question: str
+) -> AsyncGenerator[Tuple[str, str], None]:
+    """
+    Answer a question about a dataset as (event, data) pairs, sent to the
+    client as server-sent events by backend.sse.
+
+    Everything that blocks (ORM queries and commits on the request's session,
+    disk checks, loading the dataset, scheduling tasks) runs in the
+    threadpool, one call at a time, so a slow disk or a locked database only
+    holds up this stream and never the event loop the others share.
+
+    While a model call waits for admission (backend.admission), "queue"
+    events report its position and estimated wait; position 0 means it has
+    been admitted.
+
+    When the client disconnects, the run is cancelled: the pending model call
+    is dropped, code running for it in the tool pool is interrupted, and the
+    turn is not saved.
+    """
+    started = time.monotonic()
+    try:
+        upload = await run_in_threadpool(_get_upload, db, user_id, upload_id)
+    except FileNotFoundError:
+        yield ("error", "File missing on disk")
+        return
     if not upload:
-        yield f"event: error\ndata: Dataset not found or access denied\n\n"
+        yield ("error", "Dataset not found or access denied")
         return
 
-    if not os.path.exists(upload.filepath):
-        yield f"event: error\ndata: File missing on disk\n\n"
+    messages = await run_in_threadpool(build_history, db, user_id, upload_id)
+
+    # Only opening questions are cached: later answers depend on the
+    # conversation so far, and on variables left in the REPL session, also by
+    # turns that were cancelled or failed and so are not in the history.
+    cacheable = not messages and repl_session_pristine(user_id, upload_id)
+    cache_key = answer_key(upload, user_question) if cacheable else None
+    cached = answer_cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        events, final_response = cached
+        for event, data in events:
+            yield (event, data)
+        try:
+            chat = await run_in_threadpool(_save_turn, db, user_id, upload_id, user_question, final_response)
+        except Exception as e:
+            yield ("error", str(e))
+            return
+        yield ("done", json.dumps({
+            "message_id": chat.id,
+            "cached": True,
+            "tool_calls": 0,
+            "elapsed_ms": int((time.monotonic() - started) * 1000),
+        }))
         return
 
     try:
-        df = pd.read_csv(upload.filepath)
+        session = await run_in_threadpool(open_repl_session, user_id, upload)
     except Exception as e:
-        yield f"event: error\ndata: Failed to load CSV file: {str(e)}\n\n"
+        yield ("error", f"Failed to load CSV file: {str(e)}")
         return
 
-    history_records = (
-        db.query(ChatMessage)
-        .filter(ChatMessage.upload_id == upload_id, ChatMessage.user_id == user_id)
-        .order_by(ChatMessage.created_at.asc())
-        .limit(20) 
-        .all()
-    )
-
-    messages = []
-    for record in history_records:
-        messages.append(HumanMessage(content=record.message))
-        if record.response:
-            messages.append(AIMessage(content=record.response))
-    
+    brief = await run_in_threadpool(_dataset_brief, db, upload)
+    if brief:
+        messages.insert(0, SystemMessage(content=brief))
     messages.append(HumanMessage(content=user_question))
 
     try:
-        app = create_graph(df)
-        
-        final_response = ""
-        
-        async for event in app.astream_events({"messages": messages}, version="v1"):
-            kind = event["event"]
-            
-            if kind == "on_chain_start":
-                if event["name"] == "LangGraph":
-                    yield f"event: agent_state\ndata: {json.dumps({'status': 'starting'})}\n\n"
-            
-            elif kind == "on_chat_model_stream":
-                content = event["data"]["chunk"].content
-                if content:
-                    final_response += content
-                    yield f"event: message_chunk\ndata: {json.dumps(content)}\n\n"
-
-            elif kind == "on_tool_start":
-                yield f"event: agent_state\ndata: {json.dumps({'status': 'executing_tool', 'tool': event['name']})}\n\n"
-
-            elif kind == "on_tool_end":
-                 yield f"event: agent_state\ndata: {json.dumps({'status': 'tool_finished', 'output': str(event['data'].get('output'))})}\n\n"
-
-        chat = ChatMessage(
+        notices = asyncio.Queue()
+        app = create_graph(
+            upload=upload,
+            session=session,
             user_id=user_id,
-            upload_id=upload_id,
-            message=user_question,
-            response=final_response,
+            on_queue=lambda position, wait: notices.put_nowait(("queue", (position, wait))),
+        )
+
+        final_response = ""
+        recorded = []
+        tool_calls = 0
+        first_token_ms = None
+
+        async with aclosing(_agent_events(app, messages, notices)) as events:
+            async for source, event in events:
+                if source == "queue":
+                    # Not recorded: a replay from the answer cache does not queue.
+                    position, wait = event
+                    yield ("queue", json.dumps({"position": position, "estimated_wait_seconds": wait}))
+                    continue
+
+                kind = event["event"]
+
+                if kind == "on_chain_start":
+                    if event["name"] == "LangGraph":
+                        recorded.append(("agent_state", json.dumps({'status': 'starting'})))
+                        yield recorded[-1]
+
+                elif kind == "on_chat_model_stream":
+                    content = event["data"]["chunk"].content
+                    if content:
+                        if first_token_ms is None:
+                            first_token_ms = int((time.monotonic() - started) * 1000)
+                        final_response += content
+                        recorded.append(("message_chunk", json.dumps(content)))
+                        yield recorded[-1]
+
+                elif kind == "on_tool_start":
+                    tool_calls += 1
+                    recorded.append(("agent_state", json.dumps({'status': 'executing_tool', 'tool': event['name']})))
+                    yield recorded[-1]
+
+                elif kind == "on_tool_end":
+                    output = event["data"].get("output")
+                    # Tools already bounded their output; an artifact holds the full text.
+                    artifact = getattr(output, "artifact", None) or {}
+                    state = {
+                        "status": "tool_finished",
+                        "output": str(getattr(output, "content", output)),
+                        "artifact_id": artifact.get("artifact_id"),
+                    }
+                    yield ("agent_state", json.dumps(state))
+                    # Artifacts belong to this user; replays to others leave the id out.
+                    recorded.append(("agent_state", json.dumps({**state, "artifact_id": None})))
+
+        chat = await run_in_threadpool(_save_turn, db, user_id, upload_id, user_question, final_response)
+        if cache_key and final_response:
+            answer_cache.put(cache_key, recorded, final_response)
+
+        elapsed_ms = int((time.monotonic() - started) * 1000)
+        logger.info(
+            "chat upload=%s tool_calls=%d first_token_ms=%s elapsed_ms=%d brief=%s",
+            upload_id, tool_calls, first_token_ms, elapsed_ms, bool(brief),
         )
-        db.add(chat)
-        db.commit()
-        db.refresh(chat)
-        
-        yield f"event: done\ndata: {json.dumps({'message_id': chat.id})}\n\n"
+        yield ("done", json.dumps({
+            "message_id": chat.id,
+            "cached": False,
+            "tool_calls": tool_calls,
+            "first_token_ms": first_token_ms,
+            "elapsed_ms": elapsed_ms,
+        }))
 
+    except (asyncio.CancelledError, GeneratorExit):
+        cancel_repl_run(user_id, upload_id)
+        logger.info("chat upload=%s cancelled: client disconnected", upload_id)
+        raise
     except Exception as e:
-        yield f"event: error\ndata: {str(e)}\n\n"
+        yield ("error", str(e))
@@ -0,0 +1,148 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import pandas as pd
+
+from backend.datasets import (
+    ARROW_NAME,
+    PARQUET_NAME,
+    artifact_path,
+    has_columnar_copy,
+    has_mapped_copy,
+    load_dataframe,
+)
+from backend.models.upload import Upload
+
+DATASET_CACHE_BYTES = int(os.getenv("DATASET_CACHE_BYTES", str(1024 ** 3)))
+
+# The cache hands out shallow copies of shared frames and needs copy-on-write
+# semantics for that, in every process that uses it (API, Celery and tool
+# workers). pandas 3 always has them (the option is deprecated there); older
+# pandas has to opt in, for the whole process.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+
+class DatasetCache:
+    """
+    Process-wide LRU cache of DataFrames bounded by an approximate byte budget.
+
+    Concurrent misses for the same key are single-flighted: one caller loads,
+    the others wait for its result. Frames larger than the whole budget are
+    returned but not cached.
+
+    Callers get shallow copies, which relies on pandas copy-on-write to keep
+    one caller's in-place edits out of the shared frame (enabled above).
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_load(self, key, loader) -> pd.DataFrame:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0].copy(deep=False)
+
+            future = self._loading.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._loading[key] = future
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if not leader:
+            return future.result().copy(deep=False)
+
+        try:
+            df = loader()
+            self._insert(key, df)
+            future.set_result(df)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+
+        return df.copy(deep=False)
+
+    def peek(self, key):
+        """The cached frame for key, or None without loading it."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0].copy(deep=False)
+
+    def _insert(self, key, df: pd.DataFrame):
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            while self._entries and self.current_bytes + size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+            self._entries[key] = (df, size)
+            self.current_bytes += size
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else None,
+            }
+
+
+dataset_cache = DatasetCache(DATASET_CACHE_BYTES)
+
+
+def dataset_version(upload: Upload):
+    """
+    Cache key for the current on-disk version of an upload's data. It changes
+    when a columnar copy appears, so readers move over to it.
+    """
+    if has_mapped_copy(upload):
+        path = artifact_path(upload, ARROW_NAME)
+    elif has_columnar_copy(upload):
+        path = artifact_path(upload, PARQUET_NAME)
+    else:
+        path = upload.filepath
+    stat = os.stat(path)
+    return (upload.content_hash or f"upload:{upload.id}", path, stat.st_mtime_ns, stat.st_size)
+
+
+def get_dataframe(upload: Upload) -> pd.DataFrame:
+    """Full DataFrame of an upload, served from the shared cache."""
+    return dataset_cache.get_or_load(dataset_version(upload), lambda: load_dataframe(upload))
+
+
+def cached_dataframe(upload: Upload):
+    """
+    Full DataFrame of an upload if the shared cache already holds it, else
+    None. For readers that would otherwise stream windows from disk and should
+    not pull the whole dataset into memory just for that.
+    """
+    return dataset_cache.peek(dataset_version(upload))
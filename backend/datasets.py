@@ -0,0 +1,656 @@
+import json
+import os
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from backend.models.upload import Upload
+from backend.storage import object_dir, tmp_path_for
+
+PARQUET_NAME = "data.parquet"
+ARROW_NAME = "data.arrow"
+SCHEMA_NAME = "schema.json"
+ROW_INDEX_NAME = "row_index.npz"
+
+ROW_GROUP_SIZE = int(os.getenv("PARQUET_ROW_GROUP_SIZE", "131072"))
+CSV_BLOCK_SIZE = 64 * 1024 * 1024
+ROW_INDEX_STRIDE = 1024
+CATEGORY_MAX_DISTINCT = 1000
+CATEGORY_MAX_RATIO = 0.5
+
+
+def artifact_dir(upload: Upload) -> str:
+    """
+    Directory holding the derived artifacts of an upload. Content-addressed
+    uploads share it with every other upload of the same bytes.
+    """
+    if upload.content_hash:
+        return object_dir(upload.content_hash)
+    return f"{upload.filepath}.artifacts"
+
+
+def artifact_path(upload: Upload, name: str) -> str:
+    return os.path.join(artifact_dir(upload), name)
+
+
+def has_columnar_copy(upload: Upload) -> bool:
+    return os.path.exists(artifact_path(upload, PARQUET_NAME))
+
+
+def has_mapped_copy(upload: Upload) -> bool:
+    return os.path.exists(artifact_path(upload, ARROW_NAME))
+
+
+def open_mapped_table(upload: Upload, columns=None) -> pa.Table:
+    """
+    Memory-map the upload's Arrow IPC copy read-only.
+
+    The returned table's buffers point straight into the mapping, so nothing
+    is deserialized and pages are only read when touched. Every process that
+    maps the file (uvicorn workers, Celery children) shares the same page
+    cache copy instead of holding a private parsed one.
+    """
+    source = pa.memory_map(artifact_path(upload, ARROW_NAME), "r")
+    table = pa.ipc.open_file(source).read_all()
+    return table.select(columns) if columns is not None else table
+
+
+def _mapped_to_pandas(table: pa.Table) -> pd.DataFrame:
+    # split_blocks keeps one block per column, so numeric columns without
+    # nulls stay views of the mapped buffers instead of being consolidated.
+    return table.to_pandas(split_blocks=True)
+
+
+def load_schema(upload: Upload):
+    path = artifact_path(upload, SCHEMA_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_schema(upload: Upload, schema: dict):
+    os.makedirs(artifact_dir(upload), exist_ok=True)
+    path = artifact_path(upload, SCHEMA_NAME)
+    tmp_path = tmp_path_for(path)
+    with open(tmp_path, "w") as f:
+        json.dump(schema, f)
+    os.replace(tmp_path, path)
+
+
+def _csv_column_names(path: str):
+    reader = pacsv.open_csv(
+        path,
+        read_options=pacsv.ReadOptions(block_size=1024 * 1024),
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+    )
+    return reader.schema.names
+
+
+# Kinds a column may still turn out to be, given the kind seen so far.
+_KIND_CANDIDATES = {
+    None: ("int", "float", "bool", "timestamp"),
+    "int": ("int", "float"),
+    "float": ("float",),
+    "bool": ("bool",),
+    "timestamp": ("timestamp",),
+    "string": (),
+}
+_KIND_TYPES = {"int": pa.int64(), "float": pa.float64(), "bool": pa.bool_(), "timestamp": pa.timestamp("us")}
+
+
+class _ColumnStats:
+    def __init__(self):
+        self.kind = None
+        self.nulls = 0
+        self.min = None
+        self.max = None
+        self.float32_exact = True
+        self.distinct = set()
+
+    def update(self, values: pa.Array):
+        self.nulls += values.null_count
+        present = values.drop_null()
+        if self.distinct is not None:
+            self.distinct.update(pc.unique(present).to_pylist())
+            if len(self.distinct) > CATEGORY_MAX_DISTINCT:
+                self.distinct = None
+        if not len(present):
+            return
+
+        for kind in _KIND_CANDIDATES[self.kind]:
+            try:
+                # A failing cast of a whole block is slow; rule most kinds out on a prefix.
+                pc.cast(present.slice(0, 1024), _KIND_TYPES[kind])
+                parsed = pc.cast(present, _KIND_TYPES[kind])
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                continue
+            self.kind = kind
+            if kind == "int":
+                bounds = pc.min_max(parsed)
+                low, high = bounds["min"].as_py(), bounds["max"].as_py()
+                self.min = low if self.min is None else min(self.min, low)
+                self.max = high if self.max is None else max(self.max, high)
+            elif kind == "float":
+                array = parsed.to_numpy(zero_copy_only=False)
+                self.float32_exact &= bool(np.array_equal(
+                    array.astype(np.float32).astype(np.float64), array, equal_nan=True
+                ))
+            return
+        self.kind = "string"
+
+    def to_column(self, name: str, rows: int) -> dict:
+        column = {"name": name, "type": "string", "dtype": None}
+        if self.kind is None:
+            # No values at all: pandas reads an all-empty column as float64 NaN.
+            column["type"] = column["dtype"] = "float64"
+        elif self.kind == "int":
+            int_type = next(
+                t for t in (np.int8, np.int16, np.int32, np.int64)
+                if np.iinfo(t).min <= self.min and self.max <= np.iinfo(t).max
+            )
+            column["type"] = np.dtype(int_type).name
+            # Missing values force pandas to float64.
+            column["dtype"] = column["type"] if self.nulls == 0 else "float64"
+        elif self.kind == "float":
+            # Integers seen before the column turned float are exact in float32 only up to 2**24.
+            fits_float32 = self.float32_exact and (
+                self.min is None or (-2 ** 24 <= self.min and self.max <= 2 ** 24)
+            )
+            column["type"] = column["dtype"] = "float32" if fits_float32 else "float64"
+        elif self.kind == "bool":
+            column["type"] = "bool"
+            column["dtype"] = "bool" if self.nulls == 0 else None
+        elif self.kind == "timestamp":
+            column["type"] = "timestamp[us]"
+            column["dtype"] = "datetime64[us]"
+        elif (
+            self.kind == "string"
+            and self.distinct is not None
+            and len(self.distinct) <= CATEGORY_MAX_RATIO * (rows - self.nulls)
+        ):
+            column["dtype"] = "category"
+            column["categories"] = sorted(self.distinct)
+        return column
+
+
+def infer_schema(upload: Upload):
+    """
+    Infer a compact schema for the upload's CSV in one streaming pass and
+    persist it with the upload's artifacts.
+
+    Every column is read as text and, block by block, narrowed to the
+    tightest kind all of its values parse as: integers get the smallest
+    width holding their range, floats become float32 when that is lossless,
+    ISO-8601 values become timestamps, and low-cardinality text becomes a
+    categorical with a fixed category list. The columnar copies and every
+    later CSV read use this schema instead of re-inferring types.
+
+    Returns:
+        dict: {"columns": [{"name", "type", "dtype", "categories"?}], "num_rows"}
+    """
+    names = _csv_column_names(upload.filepath)
+    reader = pacsv.open_csv(
+        upload.filepath,
+        read_options=pacsv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(
+            column_types={name: pa.string() for name in names},
+            strings_can_be_null=True,
+        ),
+    )
+    stats = [_ColumnStats() for _ in names]
+    rows = 0
+    for batch in reader:
+        rows += batch.num_rows
+        for column_stats, values in zip(stats, batch.columns):
+            column_stats.update(values)
+
+    schema = {
+        "columns": [column_stats.to_column(name, rows) for name, column_stats in zip(names, stats)],
+        "num_rows": rows,
+    }
+    _write_schema(upload, schema)
+    return schema
+
+
+def _categories(column: dict) -> pa.Array:
+    return pa.array(column["categories"], type=pa.string())
+
+
+def csv_read_kwargs(upload: Upload, columns=None) -> dict:
+    """
+    pd.read_csv arguments (usecols, dtype, parse_dates) taken from the
+    persisted schema, so repeat reads skip type inference and always agree
+    on types. Without a schema only usecols is set.
+    """
+    kwargs = {"usecols": columns}
+    schema = load_schema(upload)
+    if not schema:
+        return kwargs
+
+    wanted = set(columns) if columns is not None else None
+    dtype = {}
+    parse_dates = []
+    for column in schema["columns"]:
+        name, column_dtype = column["name"], column.get("dtype")
+        if column_dtype is None or (wanted is not None and name not in wanted):
+            continue
+        if column_dtype == "category":
+            dtype[name] = pd.CategoricalDtype(column["categories"])
+        elif column_dtype.startswith("datetime64"):
+            parse_dates.append(name)
+        else:
+            dtype[name] = column_dtype
+    if dtype:
+        kwargs["dtype"] = dtype
+    if parse_dates:
+        kwargs["parse_dates"] = parse_dates
+        kwargs["date_format"] = "ISO8601"
+    return kwargs
+
+
+def csv_arrow_options(schema) -> dict:
+    """
+    pyarrow CSV read/parse/convert options for an upload: quoted newlines
+    allowed and, with a persisted schema, its column types (categoricals as
+    plain text), so no block has to guess a column's type.
+    """
+    convert_options = pacsv.ConvertOptions()
+    if schema:
+        convert_options = pacsv.ConvertOptions(
+            column_types={
+                c["name"]: pa.string() if c.get("dtype") == "category" else pa.type_for_alias(c["type"])
+                for c in schema["columns"]
+            },
+            strings_can_be_null=True,
+        )
+    return {
+        "read_options": pacsv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+        "parse_options": pacsv.ParseOptions(newlines_in_values=True),
+        "convert_options": convert_options,
+    }
+
+
+def convert_to_columnar(upload: Upload):
+    """
+    Write typed columnar copies of the upload's CSV: Parquet (compressed,
+    with row group statistics for filtered scans) and an uncompressed Arrow
+    IPC file that readers memory-map.
+
+    Column types come from the persisted schema (see infer_schema) when there
+    is one; otherwise pyarrow infers them from the first block. The CSV is
+    read in blocks with pyarrow's streaming reader and each block is appended
+    to both files, so memory stays bounded by the block size. Files are
+    written under a temporary name and renamed into place, which makes
+    readers switch over atomically.
+
+    Returns:
+        dict: the schema, with the row and row group counts filled in
+    """
+    os.makedirs(artifact_dir(upload), exist_ok=True)
+    parquet_path = artifact_path(upload, PARQUET_NAME)
+    arrow_path = artifact_path(upload, ARROW_NAME)
+    tmp_paths = [tmp_path_for(parquet_path), tmp_path_for(arrow_path)]
+
+    schema = load_schema(upload)
+    categories = {}
+    if schema:
+        # Categoricals are read as text and encoded against the schema's fixed
+        # category list, so every block shares one dictionary.
+        categories = {c["name"]: _categories(c) for c in schema["columns"] if c.get("dtype") == "category"}
+
+    reader = pacsv.open_csv(upload.filepath, **csv_arrow_options(schema))
+    output_schema = pa.schema([
+        pa.field(field.name, pa.dictionary(pa.int32(), pa.string())) if field.name in categories else field
+        for field in reader.schema
+    ])
+    try:
+        with pq.ParquetWriter(tmp_paths[0], output_schema) as parquet_writer, \
+                pa.ipc.new_file(tmp_paths[1], output_schema) as arrow_writer:
+            for batch in reader:
+                if categories:
+                    batch = pa.record_batch([
+                        pa.DictionaryArray.from_arrays(
+                            pc.index_in(values, value_set=categories[field.name]), categories[field.name]
+                        ) if field.name in categories else values
+                        for field, values in zip(reader.schema, batch.columns)
+                    ], schema=output_schema)
+                parquet_writer.write_batch(batch, row_group_size=ROW_GROUP_SIZE)
+                arrow_writer.write_batch(batch)
+        os.replace(tmp_paths[1], arrow_path)
+        os.replace(tmp_paths[0], parquet_path)
+    except BaseException:
+        for tmp_path in tmp_paths:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        raise
+
+    metadata = pq.ParquetFile(parquet_path).metadata
+    if not schema:
+        schema = {"columns": [{"name": field.name, "type": str(field.type)} for field in reader.schema]}
+    schema["num_rows"] = metadata.num_rows
+    schema["num_row_groups"] = metadata.num_row_groups
+    _write_schema(upload, schema)
+    return schema
+
+
+def build_row_index(upload: Upload, stride: int = ROW_INDEX_STRIDE):
+    """
+    Record the byte offset of every stride-th data row of the CSV, so a page
+    deep into the file can be read by seeking instead of parsing everything
+    before it.
+
+    Row boundaries are newlines outside double quotes; quote parity is
+    tracked across blocks, so quoted fields containing newlines are handled.
+    Blank lines ("" or a lone "\\r") are not rows, as pandas and Arrow skip
+    them too. The scan is vectorized and reads the file in fixed-size blocks.
+
+    Returns:
+        int: number of data rows in the file
+    """
+    offsets = []
+    lines = 0  # non-blank lines seen; the first one is the header
+    position = 0
+    in_quotes = 0
+    last_newline = -1  # absolute position of the previous line break
+    last_byte = ord("\n")
+
+    def add_lines(ends, before_ends):
+        # Lines ending at `ends` (exclusive), with the byte before each end.
+        nonlocal lines, last_newline
+        starts = np.concatenate(([last_newline + 1], ends[:-1] + 1))
+        lengths = ends - starts
+        blank = (lengths == 0) | ((lengths == 1) & (before_ends == ord("\r")))
+        starts = starts[~blank]
+        row_numbers = lines + np.arange(len(starts)) - 1  # the header is row -1
+        offsets.append(starts[(row_numbers >= 0) & (row_numbers % stride == 0)])
+        lines += len(starts)
+        last_newline = int(ends[-1])
+
+    with open(upload.filepath, "rb") as f:
+        while True:
+            block = f.read(CSV_BLOCK_SIZE)
+            if not block:
+                break
+            data = np.frombuffer(block, dtype=np.uint8)
+            parity = (np.cumsum(data == ord('"')) + in_quotes) % 2
+            newlines = np.flatnonzero((data == ord("\n")) & (parity == 0))
+            if len(newlines):
+                before = np.where(newlines > 0, data[np.maximum(newlines - 1, 0)], last_byte)
+                add_lines(position + newlines, before)
+
+            in_quotes = int(parity[-1])
+            position += len(block)
+            last_byte = int(data[-1])
+
+    if position > last_newline + 1:
+        # A last line without a trailing newline.
+        add_lines(np.array([position]), np.array([last_byte]))
+
+    offsets = np.concatenate(offsets) if offsets else np.empty(0, dtype=np.int64)
+    total_rows = max(lines - 1, 0)
+
+    os.makedirs(artifact_dir(upload), exist_ok=True)
+    path = artifact_path(upload, ROW_INDEX_NAME)
+    tmp_path = tmp_path_for(path)
+    with open(tmp_path, "wb") as f:
+        np.savez(f, offsets=offsets.astype(np.int64), stride=stride, total_rows=total_rows)
+    os.replace(tmp_path, path)
+    return total_rows
+
+
+def load_row_index(upload: Upload):
+    path = artifact_path(upload, ROW_INDEX_NAME)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return {"offsets": data["offsets"], "stride": int(data["stride"]), "total_rows": int(data["total_rows"])}
+
+
+def count_rows(upload: Upload):
+    """Total number of data rows, if known without scanning the file."""
+    if has_columnar_copy(upload):
+        return pq.ParquetFile(artifact_path(upload, PARQUET_NAME)).metadata.num_rows
+    index = load_row_index(upload)
+    return index["total_rows"] if index else None
+
+
+def _row_groups_for_range(metadata, offset: int, limit: int):
+    """Row groups overlapping [offset, offset + limit) and the first row of the first one."""
+    groups = []
+    first_row = None
+    start = 0
+    for i in range(metadata.num_row_groups):
+        end = start + metadata.row_group(i).num_rows
+        if end > offset and start < offset + limit:
+            groups.append(i)
+            if first_row is None:
+                first_row = start
+        start = end
+    return groups, first_row
+
+
+def _drop_rows(chunks, skip: int):
+    for chunk in chunks:
+        if skip >= len(chunk):
+            skip -= len(chunk)
+            continue
+        yield chunk.iloc[skip:].reset_index(drop=True)
+        skip = 0
+
+
+@contextmanager
+def _csv_from_row(upload: Upload, offset: int, **read_csv_kwargs):
+    """
+    pd.read_csv positioned at data row `offset`, seeking to the nearest
+    indexed byte offset when a row index exists. Yields None past the end.
+
+    The rows between the checkpoint and `offset` are parsed and dropped
+    rather than skipped with skiprows, which counts blank lines as rows.
+    """
+    index = load_row_index(upload)
+    if index is None:
+        yield pd.read_csv(upload.filepath, skiprows=range(1, offset + 1), **read_csv_kwargs)
+        return
+
+    checkpoint = offset // index["stride"]
+    if offset >= index["total_rows"] or checkpoint >= len(index["offsets"]):
+        yield None
+        return
+
+    header = pd.read_csv(upload.filepath, nrows=0).columns.tolist()
+    skip = offset - checkpoint * index["stride"]
+    if read_csv_kwargs.get("nrows") is not None:
+        read_csv_kwargs["nrows"] += skip
+    with open(upload.filepath, "rb") as f:
+        f.seek(int(index["offsets"][checkpoint]))
+        reader = pd.read_csv(f, header=None, names=header, **read_csv_kwargs)
+        if read_csv_kwargs.get("chunksize"):
+            yield _drop_rows(reader, skip)
+        else:
+            yield reader.iloc[skip:].reset_index(drop=True)
+
+
+def read_rows(upload: Upload, offset: int, limit: int, columns=None) -> pd.DataFrame:
+    """
+    Read rows [offset, offset + limit) without touching the rows before them.
+
+    With the mapped Arrow copy this is a zero-copy slice; with the Parquet
+    copy only the row groups overlapping the range are decoded; otherwise the
+    CSV is opened at the nearest indexed byte offset.
+    """
+    if has_mapped_copy(upload):
+        return _mapped_to_pandas(open_mapped_table(upload, columns).slice(offset, limit))
+
+    if has_columnar_copy(upload):
+        parquet_file = pq.ParquetFile(artifact_path(upload, PARQUET_NAME))
+        groups, first_row = _row_groups_for_range(parquet_file.metadata, offset, limit)
+        if not groups:
+            return load_dataframe(upload, columns=columns, nrows=0)
+        table = parquet_file.read_row_groups(groups, columns=columns)
+        return table.slice(offset - first_row, limit).to_pandas()
+
+    with _csv_from_row(upload, offset, nrows=limit, **csv_read_kwargs(upload, columns)) as df:
+        if df is None:
+            return load_dataframe(upload, columns=columns, nrows=0)
+        return df
+
+
+def iter_row_batches(upload: Upload, offset: int, limit: int, columns=None, batch_size: int = 8192):
+    """
+    Yield rows [offset, offset + limit) as pyarrow RecordBatches of at most
+    batch_size rows, so responses can be streamed with constant memory.
+    """
+    if has_mapped_copy(upload):
+        yield from open_mapped_table(upload, columns).slice(offset, limit).to_batches(max_chunksize=batch_size)
+        return
+
+    if has_columnar_copy(upload):
+        parquet_file = pq.ParquetFile(artifact_path(upload, PARQUET_NAME))
+        groups, first_row = _row_groups_for_range(parquet_file.metadata, offset, limit)
+        if not groups:
+            return
+        skip = offset - first_row
+        remaining = limit
+        for batch in parquet_file.iter_batches(batch_size=batch_size, row_groups=groups, columns=columns):
+            if skip >= len(batch):
+                skip -= len(batch)
+                continue
+            batch = batch.slice(skip, remaining)
+            skip = 0
+            remaining -= len(batch)
+            yield batch
+            if remaining <= 0:
+                return
+        return
+
+    with _csv_from_row(
+        upload, offset, nrows=limit, chunksize=batch_size, **csv_read_kwargs(upload, columns)
+    ) as reader:
+        if reader is None:
+            return
+        schema = None
+        for chunk in reader:
+            if chunk.empty:
+                # Past the end; its all-null types would not match row_batch_schema.
+                continue
+            # Later CSV chunks may infer different types; keep the first chunk's schema.
+            batch = pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False)
+            schema = batch.schema
+            yield batch
+
+
+def row_batch_schema(upload: Upload, columns=None) -> pa.Schema:
+    """
+    Schema of the batches iter_row_batches yields, for responses that must
+    describe their columns even when the range holds no rows.
+    """
+    if has_mapped_copy(upload):
+        return open_mapped_table(upload, columns).schema
+    if has_columnar_copy(upload):
+        schema = pq.read_schema(artifact_path(upload, PARQUET_NAME))
+        return pa.schema([schema.field(c) for c in columns]) if columns else schema
+    # Types are inferred from a sample, as the CSV reader does for the first batch.
+    sample = load_dataframe(upload, columns=columns, nrows=1000)
+    return pa.Schema.from_pandas(sample.iloc[:0], preserve_index=False)
+
+
+_PANDAS_OPS = {
+    "=": lambda s, v: s == v,
+    "==": lambda s, v: s == v,
+    "!=": lambda s, v: s != v,
+    "<": lambda s, v: s < v,
+    "<=": lambda s, v: s <= v,
+    ">": lambda s, v: s > v,
+    ">=": lambda s, v: s >= v,
+    "in": lambda s, v: s.isin(v),
+    "not in": lambda s, v: ~s.isin(v),
+}
+
+
+def _apply_filters(df: pd.DataFrame, filters) -> pd.DataFrame:
+    mask = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        mask &= _PANDAS_OPS[op](df[column], value)
+    return df[mask]
+
+
+def load_dataframe(upload: Upload, columns=None, filters=None, nrows=None) -> pd.DataFrame:
+    """
+    Load an upload as a DataFrame, preferring its columnar copy.
+
+    Args:
+        columns: only read these columns (projection)
+        filters: list of (column, op, value) conjunctions; with the columnar
+            copy, row groups whose statistics exclude a match are skipped
+        nrows: stop after this many rows
+
+    Unfiltered loads come from the memory-mapped Arrow copy without
+    deserializing. Falls back to parsing the CSV while the columnar copies
+    are still pending.
+    """
+    if has_mapped_copy(upload) and not filters:
+        table = open_mapped_table(upload, columns)
+        if nrows is not None:
+            table = table.slice(0, nrows)
+        return _mapped_to_pandas(table)
+
+    if has_columnar_copy(upload):
+        parquet_path = artifact_path(upload, PARQUET_NAME)
+        if nrows is None:
+            return pq.read_table(parquet_path, columns=columns, filters=filters).to_pandas()
+
+        if filters:
+            table = pq.read_table(parquet_path, columns=columns, filters=filters)
+            return table.slice(0, nrows).to_pandas()
+
+        batches = []
+        remaining = nrows
+        for batch in pq.ParquetFile(parquet_path).iter_batches(columns=columns):
+            batches.append(batch.slice(0, remaining))
+            remaining -= len(batches[-1])
+            if remaining <= 0:
+                break
+        if not batches:
+            schema = pq.read_schema(parquet_path)
+            if columns is not None:
+                schema = pa.schema([schema.field(c) for c in columns])
+            return schema.empty_table().to_pandas()
+        return pa.Table.from_batches(batches).to_pandas()
+
+    if filters:
+        usecols = None
+        if columns is not None:
+            usecols = list(dict.fromkeys([*columns, *(column for column, _, _ in filters)]))
+        df = _apply_filters(pd.read_csv(upload.filepath, **csv_read_kwargs(upload, usecols)), filters)
+        if columns is not None:
+            df = df[columns]
+        return df.head(nrows) if nrows is not None else df
+
+    return pd.read_csv(upload.filepath, nrows=nrows, **csv_read_kwargs(upload, columns))
+
+
+def iter_batches(upload: Upload, columns=None, batch_size: int = 100_000):
+    """
+    Yield the upload as a sequence of DataFrames of at most batch_size rows,
+    so callers can process files larger than memory.
+    """
+    if has_mapped_copy(upload):
+        for batch in open_mapped_table(upload, columns).to_batches(max_chunksize=batch_size):
+            yield batch.to_pandas()
+        return
+
+    if has_columnar_copy(upload):
+        parquet_file = pq.ParquetFile(artifact_path(upload, PARQUET_NAME))
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+            yield batch.to_pandas()
+        return
+
+    with pd.read_csv(upload.filepath, chunksize=batch_size, **csv_read_kwargs(upload, columns)) as reader:
+        yield from reader
@@ -2,11 +2,24 @@ from fastapi import FastAPI
 from backend.database import Base, engine
 from backend.routers import auth, upload, data, ai, task_status, chat
 from backend.models import ChatMessage 
+from backend.agents.tool_pool import start_tool_pool, stop_tool_pool
 
 Base.metadata.create_all(bind=engine)
 
 app = FastAPI(title="AI_Dash")
 
+
+@app.on_event("startup")
+def warm_tool_pool():
+    # Fork the agent's Python workers before the first chat needs them.
+    start_tool_pool()
+
+
+@app.on_event("shutdown")
+def shutdown_tool_pool():
+    stop_tool_pool()
+
+
 app.include_router(auth.router)
 app.include_router(upload.router)
 app.include_router(data.router)
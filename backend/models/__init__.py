@@ -1,5 +1,8 @@
 # This file makes the models directory a Python package.
 from .user import User
-from .chat import ChatMessage
+from .chat import ChatMessage, ChatSummary
+from .upload_session import UploadSession
+from .dataset_object import DatasetObject
+from .tool_artifact import ToolArtifact
 
-__all__ = ["User", "ChatMessage"]
+__all__ = ["User", "ChatMessage", "ChatSummary", "UploadSession", "DatasetObject", "ToolArtifact"]
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, ForeignKey, Text, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, Text, DateTime, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from backend.database import Base
@@ -17,3 +17,19 @@ class ChatMessage(Base):
 
     user = relationship("User", backref="chat_messages")
     upload = relationship("Upload", backref="chat_messages")
+
+
+class ChatSummary(Base):
+    """
+    Rolling summary of the turns of a conversation that no longer fit in the
+    prompt's history window: every ChatMessage up to covered_until_id.
+    """
+    __tablename__ = "chat_summaries"
+    __table_args__ = (UniqueConstraint("user_id", "upload_id", name="uq_chat_summaries_user_upload"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    upload_id = Column(Integer, ForeignKey("uploads.id", ondelete="CASCADE"), nullable=False)
+    summary = Column(Text, nullable=False)
+    covered_until_id = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -0,0 +1,17 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, DateTime
+from backend.database import Base
+
+
+class DatasetObject(Base):
+    """
+    A stored file, addressed by the sha256 of its bytes. Upload rows point at
+    it through Upload.content_hash; ref_count is the number of such rows.
+    """
+    __tablename__ = "dataset_objects"
+
+    content_hash = Column(String(64), primary_key=True, index=True)
+    path = Column(String, nullable=False)
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, Text, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, String, Text, DateTime
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from backend.database import Base
@@ -9,7 +9,9 @@ class Summary(Base):
     id = Column(Integer, primary_key=True, index=True)
     upload_id = Column(Integer, ForeignKey("uploads.id", ondelete="CASCADE"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    content_hash = Column(String(64), nullable=True, index=True)
     summary_json = Column(Text, nullable=False)
+    insights_json = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     upload = relationship("Upload", backref="summary")
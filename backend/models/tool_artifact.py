@@ -0,0 +1,19 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from backend.database import Base
+
+
+class ToolArtifact(Base):
+    """
+    Full output of an agent tool call whose text exceeded the output budget.
+    The chat stream and the model only see a preview plus this row's id.
+    """
+    __tablename__ = "tool_artifacts"
+
+    id = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    upload_id = Column(Integer, ForeignKey("uploads.id", ondelete="CASCADE"), nullable=False, index=True)
+    tool_name = Column(String, nullable=False)
+    content = Column(Text, nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
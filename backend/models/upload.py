@@ -12,6 +12,7 @@ class Upload(Base):
     filename = Column(String, nullable=False)
     filepath = Column(String, nullable=False)
     size = Column(Integer, nullable=False)
+    content_hash = Column(String(64), nullable=True, index=True)
     status = Column(String, default="uploaded", nullable=False)
     uploaded_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
     user = relationship("User", backref="uploads")
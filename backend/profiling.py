@@ -0,0 +1,398 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from backend.dataset_cache import cached_dataframe
+from backend.datasets import artifact_dir, artifact_path, iter_batches, load_dataframe
+from backend.models.upload import Upload
+from backend.sketches import HyperLogLog, KLLSketch, MisraGries, hash_values
+from backend.storage import tmp_path_for
+
+SAMPLE_ROWS = 5
+PROFILE_NAME = "profile.npz"
+PROFILE_BATCH_ROWS = 100_000
+# Datasets up to this many rows get exact quartiles, distinct counts and top
+# values; larger ones get the sketch estimates.
+PROFILE_EXACT_ROWS = int(os.getenv("PROFILE_EXACT_ROWS", "100000"))
+
+
+def clean_for_json(data):
+    if isinstance(data, dict):
+        return {k: clean_for_json(v) for k, v in data.items()}
+    elif isinstance(data, list):
+        return [clean_for_json(v) for v in data]
+    elif isinstance(data, float):
+        if np.isnan(data) or np.isinf(data):
+            return None
+        return data
+    return data
+
+
+class Moments:
+    """
+    Mergeable count / mean / variance / covariance accumulator for k numeric
+    columns, using the pairwise update of Chan, Golub and LeVeque.
+
+    Statistics are kept per column pair over the rows where both values are
+    present, which is what pandas' DataFrame.corr() uses, so the state is a
+    handful of k x k matrices regardless of how many rows were seen.
+    """
+
+    def __init__(self, k: int):
+        self.n = np.zeros((k, k))
+        # mean[i, j] / m2[i, j]: mean and sum of squared deviations of column i
+        # over the rows where columns i and j are both present.
+        self.mean = np.zeros((k, k))
+        self.m2 = np.zeros((k, k))
+        # cm[i, j]: co-moment of columns i and j over those rows.
+        self.cm = np.zeros((k, k))
+        self.min = np.full(k, np.inf)
+        self.max = np.full(k, -np.inf)
+
+    def update(self, x: np.ndarray):
+        """Fold in a (rows x k) float block; NaN marks a missing value."""
+        valid = ~np.isnan(x)
+        if not valid.any():
+            return
+
+        # Centre the block first so the sums below do not lose precision.
+        counts = valid.sum(axis=0)
+        shift = np.where(counts > 0, np.nansum(x, axis=0) / np.maximum(counts, 1), 0.0)
+        xc = np.where(valid, x - shift, 0.0)
+        v = valid.astype(float)
+
+        n = v.T @ v
+        s = xc.T @ v
+        sq = (xc * xc).T @ v
+        p = xc.T @ xc
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_c = np.where(n > 0, s / n, 0.0)
+
+        block = Moments.__new__(Moments)
+        block.n = n
+        block.mean = mean_c + shift[:, None]
+        block.m2 = sq - s * mean_c
+        block.cm = p - s * mean_c.T
+        block.min = np.where(counts > 0, np.nanmin(np.where(valid, x, np.inf), axis=0), np.inf)
+        block.max = np.where(counts > 0, np.nanmax(np.where(valid, x, -np.inf), axis=0), -np.inf)
+        self.merge(block)
+
+    def merge(self, other: "Moments"):
+        n = self.n + other.n
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = other.mean - self.mean
+            weight = np.where(n > 0, self.n * other.n / n, 0.0)
+            self.mean = np.where(n > 0, self.mean + delta * other.n / n, 0.0)
+        self.m2 = self.m2 + other.m2 + delta * delta * weight
+        self.cm = self.cm + other.cm + delta * delta.T * weight
+        self.n = n
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+
+    def to_state(self):
+        return {"n": self.n, "mean": self.mean, "m2": self.m2, "cm": self.cm, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_state(cls, state):
+        moments = cls.__new__(cls)
+        for name in ("n", "mean", "m2", "cm", "min", "max"):
+            setattr(moments, name, state[name])
+        return moments
+
+    def count(self):
+        return np.diag(self.n)
+
+    def column_mean(self):
+        return np.where(self.count() > 0, np.diag(self.mean), np.nan)
+
+    def std(self):
+        count = self.count()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(count > 1, np.sqrt(np.diag(self.m2) / (count - 1)), np.nan)
+
+    def corr(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = self.cm / np.sqrt(self.m2 * self.m2.T)
+        return np.where(self.n > 1, corr, np.nan)
+
+
+class StreamingProfiler:
+    """
+    Builds the dataset summary from a sequence of DataFrame chunks in a single
+    pass. Memory use is O(columns^2), independent of the number of rows.
+
+    Percentiles, distinct counts and top values come from per-column KLL,
+    HyperLogLog and Misra-Gries sketches, and the summary reports their error
+    bounds under "approximations". When the caller has the whole dataset in
+    one frame it can set exact values instead (see set_exact).
+
+    Column kinds are fixed by the first chunk. When reading raw CSV chunks a
+    numeric column can turn out to contain text further down; such values are
+    counted as missing for the numeric statistics.
+    """
+
+    def __init__(self):
+        self.columns = None
+        self.data_types = None
+        self.numeric_columns = None
+        self.categorical_columns = None
+        self.rows = 0
+        self.missing = None
+        self.moments = None
+        self.sample = None
+        self.quantile_sketches = {}
+        self.distinct_sketches = {}
+        self.frequent_sketches = {}
+        self.exact = None
+
+    def _init_columns(self, chunk: pd.DataFrame):
+        self.columns = chunk.columns.tolist()
+        self.data_types = chunk.dtypes.astype(str).to_dict()
+        self.numeric_columns = [
+            c for c in self.columns
+            if pd.api.types.is_numeric_dtype(chunk[c]) and not pd.api.types.is_bool_dtype(chunk[c])
+        ]
+        self.categorical_columns = [c for c in self.columns if c not in self.numeric_columns]
+        self.missing = pd.Series(0, index=self.columns, dtype="int64")
+        self.moments = Moments(len(self.numeric_columns))
+        self.sample = chunk.head(SAMPLE_ROWS)
+        self.quantile_sketches = {c: KLLSketch() for c in self.numeric_columns}
+        self.distinct_sketches = {c: HyperLogLog() for c in self.columns}
+        self.frequent_sketches = {c: MisraGries() for c in self.categorical_columns}
+
+    def update(self, chunk: pd.DataFrame):
+        if self.columns is None:
+            self._init_columns(chunk)
+        if chunk.empty:
+            return
+
+        self.rows += len(chunk)
+        self.missing += chunk.isnull().sum()
+
+        if self.numeric_columns:
+            numeric = chunk[self.numeric_columns].apply(pd.to_numeric, errors="coerce")
+            values = numeric.to_numpy(dtype=float, na_value=np.nan)
+            self.moments.update(values)
+            for i, column in enumerate(self.numeric_columns):
+                self.quantile_sketches[column].update(values[:, i])
+
+        for column in self.columns:
+            self.distinct_sketches[column].update_hashes(hash_values(chunk[column]))
+        for column in self.categorical_columns:
+            self.frequent_sketches[column].update(chunk[column])
+
+    def set_exact(self, df: pd.DataFrame):
+        """Replace the sketch estimates with exact values computed from the complete dataset."""
+        exact = {}
+        for column in self.numeric_columns:
+            quartiles = pd.to_numeric(df[column], errors="coerce").quantile([0.25, 0.5, 0.75])
+            exact[column] = {f"{int(q * 100)}%": float(value) for q, value in quartiles.items()}
+        for column in self.categorical_columns:
+            counts = df[column].value_counts()
+            top = counts.index[0] if len(counts) else None
+            exact[column] = {
+                "unique": int(df[column].nunique()),
+                "top": top.item() if hasattr(top, "item") else top,
+                "freq": int(counts.iloc[0]) if len(counts) else None,
+            }
+        self.exact = exact
+
+    def _numeric_stats(self):
+        count = self.moments.count()
+        mean = self.moments.column_mean()
+        std = self.moments.std()
+        stats = {}
+        for i, column in enumerate(self.numeric_columns):
+            has_values = count[i] > 0
+            q25, q50, q75 = self.quantile_sketches[column].quantiles([0.25, 0.5, 0.75])
+            stats[column] = {
+                "count": float(count[i]),
+                "mean": float(mean[i]),
+                "std": float(std[i]),
+                "min": float(self.moments.min[i]) if has_values else None,
+                "25%": q25,
+                "50%": q50,
+                "75%": q75,
+                "max": float(self.moments.max[i]) if has_values else None,
+            }
+        return stats
+
+    def _categorical_stats(self):
+        stats = {}
+        for column in self.categorical_columns:
+            top = self.frequent_sketches[column].top(1)
+            stats[column] = {
+                "count": float(self.rows - self.missing[column]),
+                "unique": self.distinct_sketches[column].count(),
+                "top": top[0][0] if top else None,
+                "freq": top[0][1] if top else None,
+            }
+        return stats
+
+    def _approximations(self):
+        return {
+            "quantile_rank_error": KLLSketch().rank_error,
+            "distinct_count_relative_error": HyperLogLog().relative_error,
+            "distinct_counts": {c: self.distinct_sketches[c].count() for c in self.columns},
+            "top_values": {
+                c: {
+                    "values": [[value, count] for value, count in self.frequent_sketches[c].top()],
+                    "max_undercount": self.frequent_sketches[c].error,
+                }
+                for c in self.categorical_columns
+            },
+        }
+
+    def summary(self, filename: str) -> dict:
+        stats = self._numeric_stats()
+        stats.update(self._categorical_stats())
+        for column, values in (self.exact or {}).items():
+            stats[column].update(values)
+
+        summary = {
+            "filename": filename,
+            "shape": {"rows": self.rows, "columns": len(self.columns)},
+            "columns": self.columns,
+            "missing_values": {c: int(v) for c, v in self.missing.items()},
+            "data_types": self.data_types,
+            "stats": clean_for_json(stats),
+            "numeric_columns": self.numeric_columns,
+            "categorical_columns": self.categorical_columns,
+        }
+
+        if len(self.numeric_columns) >= 2:
+            corr = pd.DataFrame(self.moments.corr(), index=self.numeric_columns, columns=self.numeric_columns).round(3)
+            summary["correlation"] = clean_for_json(corr.where(pd.notnull(corr), None).to_dict())
+
+        sample_data = self.sample.astype(object).where(pd.notnull(self.sample), None).to_dict(orient="records")
+        summary["sample_data"] = clean_for_json(sample_data)
+        if self.exact is None:
+            summary["approximations"] = clean_for_json(self._approximations())
+
+        return summary
+
+    def save(self, path: str):
+        """
+        Persist the accumulated state (moments and sketches) so the summary,
+        or other quantiles, can be produced later without rescanning.
+        """
+        arrays = {f"moments.{k}": v for k, v in self.moments.to_state().items()}
+        meta = {
+            "columns": self.columns,
+            "data_types": self.data_types,
+            "numeric_columns": self.numeric_columns,
+            "categorical_columns": self.categorical_columns,
+            "rows": self.rows,
+            "missing": {c: int(v) for c, v in self.missing.items()},
+            "sample": self.sample.astype(object).where(pd.notnull(self.sample), None).to_dict(orient="split"),
+            "sketches": {},
+            "exact": self.exact,
+        }
+        sketches = [
+            ("kll", self.quantile_sketches),
+            ("hll", self.distinct_sketches),
+            ("mg", self.frequent_sketches),
+        ]
+        for kind, by_column in sketches:
+            for i, (column, sketch) in enumerate(by_column.items()):
+                state = sketch.to_state()
+                meta["sketches"][f"{kind}.{i}"] = {"column": column, "meta": state.pop("meta")}
+                arrays.update({f"{kind}.{i}.{name}": value for name, value in state.items()})
+        arrays["meta"] = np.array(json.dumps(meta, default=str))
+
+        # Written through a file object so numpy does not append ".npz".
+        tmp_path = tmp_path_for(path)
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "StreamingProfiler":
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+        meta = json.loads(str(arrays.pop("meta")))
+
+        profiler = cls()
+        profiler.columns = meta["columns"]
+        profiler.data_types = meta["data_types"]
+        profiler.numeric_columns = meta["numeric_columns"]
+        profiler.categorical_columns = meta["categorical_columns"]
+        profiler.rows = meta["rows"]
+        profiler.exact = meta.get("exact")
+        profiler.missing = pd.Series(meta["missing"], index=profiler.columns, dtype="int64")
+        sample = meta["sample"]
+        profiler.sample = pd.DataFrame(sample["data"], columns=sample["columns"])
+        profiler.moments = Moments.from_state({
+            name.split(".", 1)[1]: value for name, value in arrays.items() if name.startswith("moments.")
+        })
+
+        sketch_types = {
+            "kll": (KLLSketch, profiler.quantile_sketches),
+            "hll": (HyperLogLog, profiler.distinct_sketches),
+            "mg": (MisraGries, profiler.frequent_sketches),
+        }
+        for key, entry in meta["sketches"].items():
+            sketch_cls, by_column = sketch_types[key.split(".")[0]]
+            state = {name[len(key) + 1:]: value for name, value in arrays.items() if name.startswith(f"{key}.")}
+            state["meta"] = entry["meta"]
+            by_column[entry["column"]] = sketch_cls.from_state(state)
+        return profiler
+
+
+def summary_for_upload(summary_json: str, upload: Upload) -> str:
+    """
+    Returns a summary stored for another upload of the same bytes, relabelled
+    with this upload's filename so the original uploader's name is not shown.
+    """
+    summary = json.loads(summary_json)
+    summary["filename"] = upload.filename
+    return json.dumps(summary, default=str)
+
+
+def load_profile(upload: Upload):
+    """
+    Returns the persisted profiler state of an upload, or None if it has not
+    been profiled yet.
+    """
+    path = artifact_path(upload, PROFILE_NAME)
+    if not os.path.exists(path):
+        return None
+    return StreamingProfiler.load(path)
+
+
+def profile_dataset(upload: Upload) -> dict:
+    """
+    Profile an upload chunk by chunk into the summary schema rendered by the
+    frontend. Reuses the persisted sketches when the content was profiled
+    before. Up to PROFILE_EXACT_ROWS rows the chunks are also kept, and the
+    summary gets exact quartiles, distinct counts and top values.
+    """
+    profiler = load_profile(upload)
+    if profiler is not None:
+        return profiler.summary(upload.filename)
+
+    profiler = StreamingProfiler()
+    df = cached_dataframe(upload)
+    if df is not None:
+        batches = (df.iloc[start:start + PROFILE_BATCH_ROWS] for start in range(0, len(df), PROFILE_BATCH_ROWS))
+    else:
+        batches = iter_batches(upload, batch_size=PROFILE_BATCH_ROWS)
+    chunks = []
+    for chunk in batches:
+        profiler.update(chunk)
+        if chunks is not None:
+            chunks.append(chunk)
+            if profiler.rows > PROFILE_EXACT_ROWS:
+                chunks = None
+    if chunks:
+        profiler.set_exact(pd.concat(chunks, ignore_index=True))
+
+    if profiler.columns is None:
+        # No data rows: still report the header.
+        profiler.update(load_dataframe(upload, nrows=0))
+
+    os.makedirs(artifact_dir(upload), exist_ok=True)
+    profiler.save(artifact_path(upload, PROFILE_NAME))
+    return profiler.summary(upload.filename)
@@ -0,0 +1,241 @@
+from typing import Any, Literal
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from pydantic import BaseModel, Field
+
+from backend.datasets import PARQUET_NAME, artifact_path, csv_arrow_options, has_columnar_copy, load_schema
+from backend.models.upload import Upload
+
+AGGREGATE_FUNCTIONS = ("count", "sum", "mean", "min", "max", "count_distinct", "stddev", "variance")
+MAX_QUERY_ROWS = 10000
+
+
+class QueryError(Exception):
+    pass
+
+
+# ---- Query specification (shared by POST /data/query and the agent tool) ----
+class Predicate(BaseModel):
+    column: str
+    op: Literal["=", "==", "!=", "<", "<=", ">", ">=", "in", "not in", "is_null", "not_null"]
+    value: Any = None
+
+
+class Aggregate(BaseModel):
+    func: Literal["count", "sum", "mean", "min", "max", "count_distinct", "stddev", "variance"]
+    column: str | None = Field(default=None, description="Column to aggregate; omit with func='count' for count(*)")
+    alias: str | None = None
+
+
+class OrderBy(BaseModel):
+    column: str
+    descending: bool = False
+
+
+class QuerySpec(BaseModel):
+    columns: list[str] | None = Field(default=None, description="Columns to return when not aggregating")
+    where: list[Predicate] = Field(default_factory=list, description="Predicates, combined with AND")
+    group_by: list[str] = Field(default_factory=list)
+    aggregates: list[Aggregate] = Field(default_factory=list)
+    order_by: list[OrderBy] = Field(default_factory=list, description="May reference group-by columns or aggregate names")
+    limit: int = Field(default=1000, ge=1, le=MAX_QUERY_ROWS)
+
+
+def _open_dataset(upload: Upload) -> ds.Dataset:
+    if has_columnar_copy(upload):
+        return ds.dataset(artifact_path(upload, PARQUET_NAME), format="parquet")
+    # Not converted yet: read the CSV with the persisted types and the same
+    # options as the conversion, not pyarrow's first-block guesses.
+    return ds.dataset(upload.filepath, format=ds.CsvFileFormat(**csv_arrow_options(load_schema(upload))))
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _cast_value(column: str, value, field_type: pa.DataType):
+    """
+    Cast a predicate value to its column's type, so e.g. "2024-01-01" can be
+    compared with a timestamp column. Numbers compared with numeric columns
+    are left to pyarrow's own promotion (int column > 2.5).
+    """
+    if value is None:
+        return None
+    if pa.types.is_dictionary(field_type):
+        field_type = field_type.value_type
+    many = isinstance(value, (list, tuple))
+    if (pa.types.is_integer(field_type) or pa.types.is_floating(field_type)) and (
+        all(_is_number(v) for v in value) if many else _is_number(value)
+    ):
+        return value
+    try:
+        if many:
+            return pa.array(value).cast(field_type)
+        return pa.scalar(value).cast(field_type)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError) as e:
+        raise QueryError(f"Value {value!r} does not fit column '{column}' of type {field_type}: {e}")
+
+
+def _predicate(column: str, op: str, value):
+    field = pc.field(column)
+    if op in ("=", "=="):
+        return field == value
+    if op == "!=":
+        return field != value
+    if op == "<":
+        return field < value
+    if op == "<=":
+        return field <= value
+    if op == ">":
+        return field > value
+    if op == ">=":
+        return field >= value
+    if op == "in":
+        return field.isin(value)
+    if op == "not in":
+        return ~field.isin(value)
+    if op == "is_null":
+        return field.is_null()
+    if op == "not_null":
+        return field.is_valid()
+    raise QueryError(f"Unsupported operator '{op}'")
+
+
+def _decode_dictionaries(table: pa.Table) -> pa.Table:
+    """
+    Categorical columns are dictionary encoded in the columnar copy, which
+    several compute kernels (count_distinct, min/max, sorting, grouping)
+    do not accept. Decode the scanned columns to their plain values.
+    """
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(i, field.name, pc.cast(table.column(i), field.type.value_type))
+    return table
+
+
+def _aggregate_name(aggregate) -> str:
+    if aggregate.get("alias"):
+        return aggregate["alias"]
+    if aggregate.get("column") is None:
+        return "count"
+    return f"{aggregate['func']}_{aggregate['column']}"
+
+
+def _global_aggregate(table: pa.Table, aggregate):
+    func, column = aggregate["func"], aggregate.get("column")
+    if column is None:
+        return table.num_rows
+    values = table[column]
+    if func == "count":
+        return pc.count(values).as_py()
+    if func == "count_distinct":
+        return pc.count_distinct(values).as_py()
+    if func in ("stddev", "variance"):
+        return getattr(pc, func)(values, ddof=1).as_py()
+    return getattr(pc, func)(values).as_py()
+
+
+def _grouped_aggregate(table: pa.Table, group_by, aggregates) -> pa.Table:
+    specs = []
+    for aggregate in aggregates:
+        func, column = aggregate["func"], aggregate.get("column")
+        if column is None:
+            specs.append((group_by[0], "count", pc.CountOptions(mode="all")))
+        elif func in ("stddev", "variance"):
+            specs.append((column, func, pc.VarianceOptions(ddof=1)))
+        else:
+            specs.append((column, func))
+
+    result = table.group_by(group_by).aggregate(specs)
+    # pyarrow names results "<column>_<func>", which repeats for e.g. count(*)
+    # next to count(<first group column>), so take them by position: keys
+    # first, then one column per spec (older pyarrow puts the keys last).
+    n = len(group_by)
+    if result.column_names[:n] == list(group_by):
+        keys, values = result.columns[:n], result.columns[n:]
+    else:
+        values, keys = result.columns[:-n], result.columns[-n:]
+    return pa.table([*keys, *values], names=[*group_by, *(_aggregate_name(a) for a in aggregates)])
+
+
+def run_query(upload: Upload, columns=None, where=None, group_by=None, aggregates=None, order_by=None, limit: int = 1000):
+    """
+    Run a declarative query against an upload and return only the result set.
+
+    Projection and predicates are pushed down into the pyarrow scanner: only
+    the referenced columns are decoded, and with the columnar copy row groups
+    whose statistics rule out a match are skipped. Grouping, aggregation and
+    sorting then run vectorized on the (already reduced) Arrow table.
+
+    Args:
+        columns: columns to return for plain (non-aggregating) queries
+        where: list of {"column", "op", "value"} conjunctions
+        group_by: grouping columns
+        aggregates: list of {"func", "column", "alias"}; column None means count(*)
+        order_by: list of {"column", "descending"}
+        limit: maximum number of rows returned
+
+    Returns:
+        dict: {"columns": [...], "rows": [{...}, ...], "row_count": int}
+    """
+    where = where or []
+    group_by = group_by or []
+    aggregates = aggregates or []
+    order_by = order_by or []
+
+    for aggregate in aggregates:
+        if aggregate["func"] not in AGGREGATE_FUNCTIONS:
+            raise QueryError(f"Unsupported aggregate '{aggregate['func']}'")
+        if aggregate.get("column") is None and aggregate["func"] != "count":
+            raise QueryError(f"Aggregate '{aggregate['func']}' needs a column")
+    if group_by and not aggregates:
+        aggregates = [{"func": "count", "column": None}]
+
+    dataset = _open_dataset(upload)
+    available = set(dataset.schema.names)
+
+    if aggregates:
+        needed = list(dict.fromkeys([*group_by, *(a["column"] for a in aggregates if a.get("column"))]))
+    else:
+        needed = list(columns) if columns else dataset.schema.names
+    missing = [c for c in [*needed, *(p["column"] for p in where)] if c not in available]
+    if missing:
+        raise QueryError(f"Unknown columns: {', '.join(sorted(set(missing)))}")
+
+    expression = None
+    for predicate in where:
+        column = predicate["column"]
+        value = _cast_value(column, predicate.get("value"), dataset.schema.field(column).type)
+        term = _predicate(column, predicate["op"], value)
+        expression = term if expression is None else expression & term
+
+    try:
+        # An empty projection (global count(*)) scans no column data at all.
+        scanner = dataset.scanner(columns=needed, filter=expression)
+        if not aggregates and not order_by:
+            # Nothing needs the full input: stop scanning after `limit` rows.
+            table = scanner.head(limit)
+        else:
+            table = scanner.to_table()
+        table = _decode_dictionaries(table)
+
+        if aggregates and not group_by:
+            row = {_aggregate_name(a): _global_aggregate(table, a) for a in aggregates}
+            table = pa.Table.from_pylist([row])
+        elif aggregates:
+            table = _grouped_aggregate(table, group_by, aggregates)
+
+        if order_by:
+            unknown = [o["column"] for o in order_by if o["column"] not in table.column_names]
+            if unknown:
+                raise QueryError(f"Cannot order by {', '.join(unknown)}")
+            table = table.sort_by([
+                (o["column"], "descending" if o.get("descending") else "ascending") for o in order_by
+            ])
+        table = table.slice(0, limit)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError) as e:
+        raise QueryError(str(e))
+
+    return {"columns": table.column_names, "rows": table.to_pylist(), "row_count": table.num_rows}
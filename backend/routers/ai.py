@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 import os
 import json
-from backend.ai import call_groq_insights
+import logging
+from backend.ai import call_groq_insights, insights_prompt
 from backend.database import get_db
 from backend.models.upload import Upload
 from backend.models.summary import Summary
@@ -10,9 +11,17 @@ from backend.utils import get_current_user
 
 router = APIRouter(prefix="/ai", tags=["AI Insights"])
 
+logger = logging.getLogger(__name__)
+
+
+def _parse_insights(text: str):
+    return json.loads(text.replace("```json", "").replace("```", "").strip())
+
+
 @router.post("/insights/{upload_id}")
 def ai_insights(
     upload_id: int,
+    refresh: bool = Query(default=False, description="Generate new insights instead of returning the stored ones"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
 ):
@@ -34,15 +43,26 @@ def ai_insights(
             detail="Summary not found. Please generate a summary first using the /data/summary endpoint."
         )
     
-    summary = json.loads(summary_record.summary_json)
-
-    prompt = f"Analyze this dataset summary and give 3 key insights:\n{json.dumps(summary, indent=2)}"
-    try:
-        insights_json_str = call_groq_insights(prompt)
-        clean_json = insights_json_str.replace("```json", "").replace("```", "").strip()
-        insights = json.loads(clean_json)
-    except Exception as e:
-        print(f"Error parsing insights JSON: {e}")
-        insights = ["Could not parse structured insights. Raw response available."]
-        
+    # Insights generated at ingest (or for an identical earlier upload) are reused.
+    insights = None
+    if summary_record.insights_json and not refresh:
+        try:
+            insights = _parse_insights(summary_record.insights_json)
+        except ValueError:
+            logger.warning("Stored insights for upload %s are not valid JSON, regenerating", upload_id)
+
+    if insights is None:
+        try:
+            insights_json_str = call_groq_insights(
+                insights_prompt(summary_record.summary_json), user_id=current_user.id
+            )
+            insights = _parse_insights(insights_json_str)
+        except Exception as e:
+            logger.warning("Error generating insights for upload %s: %s", upload_id, e)
+            insights = ["Could not parse structured insights. Raw response available."]
+        else:
+            # Only a reply that parsed is kept; a malformed one is retried next time.
+            summary_record.insights_json = insights_json_str
+            db.commit()
+
     return {"upload_id": upload_id, "insights": insights}
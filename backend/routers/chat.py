@@ -1,17 +1,24 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from pydantic import BaseModel
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from backend.database import get_db
 from backend.utils import get_current_user
 from backend.chat_service import stream_chat_process
+from backend.sse import EventStreamResponse
+from backend.admission import llm_governor
+from backend.agents.tool_pool import repl_session_stats
+from backend.answer_cache import answer_cache
 from backend.models.chat import ChatMessage
+from backend.models.tool_artifact import ToolArtifact
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
+MAX_ARTIFACT_PAGE = 100_000
+
 
 class ChatRequest(BaseModel):
     dataset_id: int
@@ -21,19 +28,43 @@ class ChatRequest(BaseModel):
 @router.post("/", status_code=200)
 async def chat(request: ChatRequest, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
     try:
-        return StreamingResponse(
+        return EventStreamResponse(
             stream_chat_process(
                 db=db,
                 user_id=current_user.id,
                 upload_id=request.dataset_id,
                 user_question=request.message,
-            ),
-            media_type="text/event-stream",
+            )
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat processing error: {str(e)}")
 
 
+@router.get("/sessions/stats")
+def session_stats(current_user=Depends(get_current_user)):
+    """
+    Counters of this worker's persistent agent REPL sessions and, when code
+    runs in the tool worker pool, of the pool.
+    """
+    return repl_session_stats()
+
+
+@router.get("/cache/stats")
+def answer_cache_stats(current_user=Depends(get_current_user)):
+    """
+    Hit / miss / eviction counters of this worker's answer cache.
+    """
+    return answer_cache.stats()
+
+
+@router.get("/admission/stats")
+def admission_stats(current_user=Depends(get_current_user)):
+    """
+    Running and queued model calls of this worker, and its token budget.
+    """
+    return llm_governor.stats()
+
+
 @router.get("/history/{dataset_id}")
 def history(
     dataset_id: int,
@@ -62,3 +93,40 @@ def history(
         }
         for m in items
     ]
+
+
+@router.get("/artifacts/{artifact_id}")
+def get_artifact(
+    artifact_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20_000, ge=1, le=MAX_ARTIFACT_PAGE),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Page through the full output of a tool call that was truncated in the
+    chat stream. offset and limit count characters.
+    """
+    row = (
+        db.query(
+            ToolArtifact.tool_name,
+            ToolArtifact.size,
+            ToolArtifact.upload_id,
+            func.substr(ToolArtifact.content, offset + 1, limit).label("content"),
+        )
+        .filter(ToolArtifact.id == artifact_id, ToolArtifact.user_id == current_user.id)
+        .first()
+    )
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Artifact not found")
+
+    next_offset = offset + len(row.content)
+    return {
+        "id": artifact_id,
+        "upload_id": row.upload_id,
+        "tool": row.tool_name,
+        "total_chars": row.size,
+        "offset": offset,
+        "content": row.content,
+        "next_offset": next_offset if next_offset < row.size else None,
+    }
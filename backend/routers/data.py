@@ -1,18 +1,126 @@
-import pandas as pd
-import numpy as np
+import hashlib
+import io
+import json
 import os
-from fastapi import APIRouter, Depends, HTTPException, status
+import threading
+from contextlib import contextmanager
+import pandas as pd
+import pyarrow as pa
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from backend.database import get_db
+from backend.dataset_cache import cached_dataframe, dataset_cache
+from backend.datasets import count_rows, iter_row_batches, read_rows, row_batch_schema
+from backend.models.summary import Summary
 from backend.models.upload import Upload
+from backend.profiling import clean_for_json, load_profile, profile_dataset, summary_for_upload
+from backend.query import QueryError, QuerySpec, run_query
 from backend.utils import get_current_user
 
 router = APIRouter(prefix="/data", tags=["Data Summary"])
 
 
+# key -> [lock, holders and waiters]; entries are dropped when unused.
+_summary_locks: dict[str, list] = {}
+_summary_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _summary_lock(upload_record: Upload):
+    # By content, so identical uploads profile once and then share the result.
+    key = upload_record.content_hash or f"upload:{upload_record.id}"
+    with _summary_locks_guard:
+        entry = _summary_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _summary_locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _summary_locks[key]
+
+
+def _find_summary(db: Session, upload_record: Upload):
+    summary = db.query(Summary).filter(
+        Summary.upload_id == upload_record.id
+    ).order_by(Summary.id.desc()).first()
+    if summary or not upload_record.content_hash:
+        return summary
+
+    # Same bytes uploaded by someone else: copy their summary instead of recomputing.
+    shared = db.query(Summary).filter(
+        Summary.content_hash == upload_record.content_hash
+    ).order_by(Summary.id.desc()).first()
+    if not shared:
+        return None
+
+    summary = Summary(
+        upload_id=upload_record.id,
+        user_id=upload_record.user_id,
+        content_hash=upload_record.content_hash,
+        summary_json=summary_for_upload(shared.summary_json, upload_record),
+        insights_json=shared.insights_json,
+    )
+    db.add(summary)
+    db.commit()
+    db.refresh(summary)
+    return summary
+
+
+def _compute_summary(db: Session, upload_record: Upload) -> Summary:
+    """
+    Compute and persist the summary once. Concurrent requests for the same
+    upload (or the same bytes) in this process wait on the first one and then
+    read its result.
+    """
+    with _summary_lock(upload_record):
+        summary = _find_summary(db, upload_record)
+        if summary:
+            return summary
+
+        if not os.path.exists(upload_record.filepath):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File missing on disk")
+
+        try:
+            summary_data = profile_dataset(upload_record)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Error reading CSV: {str(e)}")
+
+        summary = Summary(
+            upload_id=upload_record.id,
+            user_id=upload_record.user_id,
+            content_hash=upload_record.content_hash,
+            summary_json=json.dumps(summary_data, default=str),
+        )
+        db.add(summary)
+        db.commit()
+        db.refresh(summary)
+        return summary
+
+
+def _summary_etag(upload_record: Upload, summary: Summary) -> str:
+    version = upload_record.content_hash or f"upload-{upload_record.id}"
+    # The ingest task may rewrite a summary computed on demand, so the tag
+    # also covers the stored document itself.
+    digest = hashlib.sha1(summary.summary_json.encode()).hexdigest()[:16]
+    return f'"{version}-{digest}"'
+
+
+@router.get("/cache/stats")
+def get_cache_stats(current_user=Depends(get_current_user)):
+    """
+    Hit / miss / eviction counters of this worker's dataset cache.
+    """
+    return dataset_cache.stats()
+
+
 @router.get("/summary/{upload_id}")
 def get_data_summary(
     upload_id: int,
+    if_none_match: str | None = Header(default=None),
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
@@ -24,57 +132,134 @@ def get_data_summary(
     if not upload_record:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
 
-    file_path = upload_record.filepath
-    if not os.path.exists(file_path):
+    summary = _find_summary(db, upload_record) or _compute_summary(db, upload_record)
+
+    etag = _summary_etag(upload_record, summary)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # The stored JSON already has the response shape; send it without re-encoding.
+    return Response(content=summary.summary_json, media_type="application/json", headers=headers)
+
+
+@router.get("/quantiles/{upload_id}")
+def get_quantiles(
+    upload_id: int,
+    column: str,
+    q: list[float] = Query(default=[0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    """
+    Approximate quantiles of a numeric column, answered from the sketches
+    persisted when the upload was profiled (no rescan of the data).
+    """
+    upload_record = db.query(Upload).filter(
+        Upload.id == upload_id, Upload.user_id == current_user.id
+    ).first()
+
+    if not upload_record:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+
+    if any(not 0 <= value <= 1 for value in q):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Quantiles must be between 0 and 1")
+
+    profile = load_profile(upload_record)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dataset has not been profiled yet. Please generate a summary first."
+        )
+
+    sketch = profile.quantile_sketches.get(column)
+    if sketch is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"'{column}' is not a numeric column")
+
+    return {
+        "column": column,
+        "count": sketch.n,
+        "quantiles": dict(zip([str(value) for value in q], sketch.quantiles(q))),
+        "rank_error": sketch.rank_error,
+    }
+
+
+@router.post("/query/{upload_id}")
+def query_data(
+    upload_id: int,
+    spec: QuerySpec,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    """
+    Filter / project / group / aggregate / sort the dataset server-side and
+    return only the (small) result set.
+    """
+    upload_record = db.query(Upload).filter(
+        Upload.id == upload_id, Upload.user_id == current_user.id
+    ).first()
+
+    if not upload_record:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+
+    if not os.path.exists(upload_record.filepath):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File missing on disk")
 
     try:
-        df = pd.read_csv(file_path)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error reading CSV: {str(e)}")
+        result = run_query(upload_record, **spec.model_dump())
+    except QueryError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid query: {str(e)}")
 
-    def clean_for_json(data):
-        if isinstance(data, dict):
-            return {k: clean_for_json(v) for k, v in data.items()}
-        elif isinstance(data, list):
-            return [clean_for_json(v) for v in data]
-        elif isinstance(data, float):
-            if np.isnan(data) or np.isinf(data):
-                return None
-            return data
-        return data
-
-    stats_df = df.describe(include='all')
-    stats_dict = stats_df.where(pd.notnull(stats_df), None).to_dict()
-    
-    summary = {
-        "filename": upload_record.filename,
-        "shape": {"rows": df.shape[0], "columns": df.shape[1]},
-        "columns": df.columns.tolist(),
-        "missing_values": df.isnull().sum().to_dict(),
-        "data_types": df.dtypes.astype(str).to_dict(),
-        "stats": clean_for_json(stats_dict),
-        "numeric_columns": df.select_dtypes(include="number").columns.tolist(),
-        "categorical_columns": df.select_dtypes(exclude="number").columns.tolist(),
-    }
+    return clean_for_json(result)
 
-    if len(summary["numeric_columns"]) >= 2:
-        corr = df[summary["numeric_columns"]].corr().round(3)
-        summary["correlation"] = clean_for_json(corr.where(pd.notnull(corr), None).to_dict())
 
-    sample_data = df.head(5).where(pd.notnull(df), None).to_dict(orient="records")
-    summary["sample_data"] = clean_for_json(sample_data)
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
 
-    return summary
+
+def _ndjson_stream(batches):
+    for batch in batches:
+        chunk = batch.to_pandas().to_json(orient="records", lines=True, date_format="iso")
+        if chunk and not chunk.endswith("\n"):
+            chunk += "\n"
+        yield chunk.encode()
+
+
+def _arrow_stream(batches, empty_schema):
+    sink = io.BytesIO()
+    writer = None
+    for batch in batches:
+        if writer is None:
+            writer = pa.ipc.new_stream(sink, batch.schema)
+        writer.write_batch(batch)
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+    if writer is None:
+        # No rows in range: still a valid stream, holding just the schema.
+        writer = pa.ipc.new_stream(sink, empty_schema())
+    writer.close()
+    yield sink.getvalue()
 
 
 @router.get("/content/{upload_id}")
 def get_data_content(
     upload_id: int,
-    limit: int = 10000,
+    response: Response,
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=10000, ge=1, le=100000),
+    accept: str | None = Header(default=None),
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
+    """
+    Rows [offset, offset + limit) of the dataset.
+
+    Content negotiation via Accept: application/x-ndjson streams one JSON
+    object per line and application/vnd.apache.arrow.stream streams Arrow
+    IPC record batches, both straight from the reader in bounded chunks.
+    Anything else gets a JSON array.
+    """
     upload_record = db.query(Upload).filter(
         Upload.id == upload_id, Upload.user_id == current_user.id
     ).first()
@@ -86,10 +271,40 @@ def get_data_content(
     if not os.path.exists(file_path):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File missing on disk")
 
+    total_rows = count_rows(upload_record)
+    headers = {}
+    if total_rows is not None:
+        headers["X-Total-Rows"] = str(total_rows)
+        if offset + limit < total_rows:
+            headers["X-Next-Offset"] = str(offset + limit)
+
+    # A frame the agent or another reader already loaded is sliced in memory;
+    # otherwise only the requested window is read from disk.
+    cached = cached_dataframe(upload_record)
+
+    accept = accept or ""
+    if NDJSON_MEDIA_TYPE in accept or ARROW_STREAM_MEDIA_TYPE in accept:
+        if cached is not None:
+            window = pa.Table.from_pandas(cached.iloc[offset:offset + limit], preserve_index=False)
+            batches = iter(window.to_batches(max_chunksize=8192))
+        else:
+            batches = iter_row_batches(upload_record, offset, limit)
+        if NDJSON_MEDIA_TYPE in accept:
+            return StreamingResponse(_ndjson_stream(batches), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+        return StreamingResponse(
+            _arrow_stream(batches, lambda: row_batch_schema(upload_record)),
+            media_type=ARROW_STREAM_MEDIA_TYPE,
+            headers=headers,
+        )
+
     try:
-        df = pd.read_csv(file_path, nrows=limit)
+        df = cached.iloc[offset:offset + limit] if cached is not None else read_rows(upload_record, offset, limit)
         
-        df = df.where(pd.notnull(df), None)
+        df = df.astype(object).where(pd.notnull(df), None)
+
+        response.headers.update(headers)
+        if len(df) == limit and total_rows is None:
+            response.headers["X-Next-Offset"] = str(offset + limit)
         
         return df.to_dict(orient="records")
     except Exception as e:
@@ -1,9 +1,10 @@
 import asyncio
 import json
 from fastapi import APIRouter, HTTPException, status
-from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from celery.result import AsyncResult
 from backend.celery_app import celery_app
+from backend.sse import EventStreamResponse
 
 router = APIRouter(prefix="/tasks", tags=["Tasks"])
 
@@ -48,28 +49,40 @@ async def get_task_status(task_id: str):
     
     return response
 
+def _task_event(task_id: str):
+    task_result = AsyncResult(task_id, app=celery_app)
+
+    if task_result.state == 'PENDING':
+        return "status", json.dumps({'status': 'pending', 'percent': 0})
+
+    elif task_result.state == 'PROGRESS':
+        data = task_result.info
+        return "progress", json.dumps({'status': 'processing', 'percent': data.get('current', 0), 'message': data.get('status', '')})
+
+    elif task_result.state == 'SUCCESS':
+        return "complete", json.dumps({'status': 'completed', 'percent': 100, 'result': task_result.result})
+
+    elif task_result.state == 'FAILURE':
+        return "error", json.dumps({'status': 'failed', 'error': str(task_result.result)})
+
+    return None
+
+
 async def event_generator(task_id: str):
     """
-    Generator for SSE events
+    (event, data) pairs for the task's state changes. Unchanged states are
+    not repeated; the SSE layer sends heartbeats in between.
     """
+    previous = None
     while True:
-        task_result = AsyncResult(task_id, app=celery_app)
-        
-        if task_result.state == 'PENDING':
-            yield f"event: status\ndata: {json.dumps({'status': 'pending', 'percent': 0})}\n\n"
-        
-        elif task_result.state == 'PROGRESS':
-            data = task_result.info
-            yield f"event: progress\ndata: {json.dumps({'status': 'processing', 'percent': data.get('current', 0), 'message': data.get('status', '')})}\n\n"
-            
-        elif task_result.state == 'SUCCESS':
-            yield f"event: complete\ndata: {json.dumps({'status': 'completed', 'percent': 100, 'result': task_result.result})}\n\n"
-            break
-            
-        elif task_result.state == 'FAILURE':
-            yield f"event: error\ndata: {json.dumps({'status': 'failed', 'error': str(task_result.result)})}\n\n"
+        # The result backend is a network round trip.
+        event = await run_in_threadpool(_task_event, task_id)
+        if event is not None and event != previous:
+            yield event
+            previous = event
+        if event is not None and event[0] in ("complete", "error"):
             break
-            
+
         await asyncio.sleep(1)
 
 @router.get("/{task_id}/stream")
@@ -77,4 +90,4 @@ async def stream_task_status(task_id: str):
     """
     Stream the status of a background task using SSE
     """
-    return StreamingResponse(event_generator(task_id), media_type="text/event-stream")
\ No newline at end of file
+    return EventStreamResponse(event_generator(task_id))
\ No newline at end of file
@@ -1,70 +1,134 @@
 import os
+import math
+import shutil
+import uuid
 import pandas as pd
 import json
-from datetime import datetime
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from backend.database import get_db
 from backend.models.upload import Upload
+from backend.models.upload_session import UploadSession
 from backend.models.summary import Summary
+from backend.models.chat import ChatMessage, ChatSummary
+from backend.models.tool_artifact import ToolArtifact
+from backend.profiling import summary_for_upload
+from backend.storage import (
+    MAX_UPLOAD_SIZE,
+    UPLOAD_DIR,
+    UploadTooLarge,
+    concat_files,
+    release_object,
+    staging_path,
+    store_object,
+    write_stream,
+)
 from backend.utils import get_current_user
+from backend.agents.tool_pool import drop_repl_sessions
 
 router = APIRouter(prefix="/upload", tags=["Upload"])
 
-UPLOAD_DIR = "uploads"
+SESSION_DIR = os.path.join(UPLOAD_DIR, ".sessions")
 
+DEFAULT_PART_SIZE = int(os.getenv("UPLOAD_PART_SIZE", str(8 * 1024 * 1024)))
+MIN_PART_SIZE = 1024 * 1024
+MAX_PART_SIZE = 128 * 1024 * 1024
+# Open sessions older than this are expired and their parts deleted.
+UPLOAD_SESSION_TTL = int(os.getenv("UPLOAD_SESSION_TTL", str(24 * 3600)))
 
-@router.post("/", status_code=202)
-async def upload_csv(
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    current_user=Depends(get_current_user),
-):
-    if not file.filename.endswith(".csv"):
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    total_size: int
+    part_size: int | None = None
+
+
+def _check_new_upload(db: Session, user_id: int, filename: str, size: int | None = None):
+    if not filename.endswith(".csv"):
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, 
+            status_code=status.HTTP_400_BAD_REQUEST,
             detail="Only CSV files allowed"
         )
 
+    if size is not None and size > MAX_UPLOAD_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File exceeds the maximum upload size of {MAX_UPLOAD_SIZE} bytes"
+        )
+
     existing_upload = db.query(Upload).filter(
-        Upload.user_id == current_user.id,
-        Upload.filename == file.filename
+        Upload.user_id == user_id,
+        Upload.filename == filename
     ).first()
-    
+
     if existing_upload:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File '{file.filename}' already exists in your uploads"
+            detail=f"File '{filename}' already exists in your uploads"
         )
 
-    user_folder = os.path.join(UPLOAD_DIR, str(current_user.id))
-    os.makedirs(user_folder, exist_ok=True)
 
-    file_path = os.path.join(user_folder, file.filename)
-    
-    try:
-        with open(file_path, "wb") as buffer:
-            buffer.write(file.file.read())
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error saving file: {str(e)}"
-        )
+def _find_reusable_summary(db: Session, content_hash: str):
+    return (
+        db.query(Summary)
+        .join(Upload, Summary.upload_id == Upload.id)
+        .filter(Upload.content_hash == content_hash, Upload.status == "completed")
+        .order_by(Summary.id.desc())
+        .first()
+    )
+
+
+def _register_upload(db: Session, user_id: int, filename: str, staged_path: str, size: int, content_hash: str):
+    obj = store_object(db, staged_path, size, content_hash)
 
-    size = os.path.getsize(file_path)
     upload_record = Upload(
-        user_id=current_user.id,
-        filename=file.filename,
-        filepath=file_path,
+        user_id=user_id,
+        filename=filename,
+        filepath=obj.path,
         size=size,
+        content_hash=content_hash,
         uploaded_at=datetime.utcnow(),
-        status="uploaded"  
+        status="uploaded"
     )
-
     db.add(upload_record)
+
+    # Identical bytes were already profiled: reuse that work instead of
+    # queueing another parse of the same file.
+    existing_summary = _find_reusable_summary(db, content_hash)
+    if existing_summary:
+        upload_record.status = "completed"
+        db.flush()
+        db.add(Summary(
+            upload_id=upload_record.id,
+            user_id=user_id,
+            content_hash=content_hash,
+            summary_json=summary_for_upload(existing_summary.summary_json, upload_record),
+            insights_json=existing_summary.insights_json,
+        ))
+
     db.commit()
     db.refresh(upload_record)
 
+    metadata = {
+        "id": upload_record.id,
+        "filename": upload_record.filename,
+        "size": upload_record.size,
+        "uploaded_at": upload_record.uploaded_at.isoformat()
+    }
+
+    if existing_summary:
+        return {
+            "message": "File upload accepted; identical content was already processed",
+            "upload_id": upload_record.id,
+            "task_id": None,
+            "status": "completed",
+            "deduplicated": True,
+            "metadata": metadata,
+        }
+
     from backend.tasks.data_tasks import process_file_task
     task = process_file_task.delay(upload_record.id)
 
@@ -73,21 +137,59 @@ async def upload_csv(
         "upload_id": upload_record.id,
         "task_id": task.id,
         "status": "processing",
-        "metadata": {
-            "id": upload_record.id,
-            "filename": upload_record.filename,
-            "size": upload_record.size,
-            "uploaded_at": upload_record.uploaded_at.isoformat()
-        },
+        "deduplicated": False,
+        "metadata": metadata,
     }
 
+
+def _content_length(request: Request):
+    try:
+        return int(request.headers["content-length"])
+    except (KeyError, ValueError):
+        return None
+
+
+@router.post("/", status_code=202)
+async def upload_csv(
+    request: Request,
+    filename: str = Query(...),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Upload a CSV as the raw request body, e.g.
+    `curl -T data.csv "$API/upload/?filename=data.csv"`.
+
+    The body is streamed straight to disk, so an oversized upload is refused
+    from its Content-Length before anything is written, and a body without
+    one is cut off as soon as it passes MAX_UPLOAD_SIZE.
+    """
+    _check_new_upload(db, current_user.id, filename, _content_length(request))
+
+    file_path = staging_path()
+
+    try:
+        size, content_hash = await write_stream(request.stream(), file_path)
+    except UploadTooLarge as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error saving file: {str(e)}"
+        )
+
+    return _register_upload(db, current_user.id, filename, file_path, size, content_hash)
+
 @router.get("/", status_code=200)
 async def get_uploads(
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
     uploads = db.query(Upload).filter(Upload.user_id == current_user.id).order_by(Upload.uploaded_at.desc()).all()
-    
+
     return [
         {
             "id": upload.id,
@@ -98,3 +200,255 @@ async def get_uploads(
         }
         for upload in uploads
     ]
+
+
+@router.delete("/{upload_id}", status_code=204)
+def delete_upload(
+    upload_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    upload = db.query(Upload).filter(
+        Upload.id == upload_id,
+        Upload.user_id == current_user.id
+    ).first()
+
+    if not upload:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+
+    db.query(ChatMessage).filter(ChatMessage.upload_id == upload.id).delete()
+    db.query(ChatSummary).filter(ChatSummary.upload_id == upload.id).delete()
+    db.query(ToolArtifact).filter(ToolArtifact.upload_id == upload.id).delete()
+    db.query(Summary).filter(Summary.upload_id == upload.id).delete()
+    released = upload.content_hash and release_object(db, upload.content_hash)
+    if not released and os.path.exists(upload.filepath):
+        # Uploads stored before the object store kept a private copy.
+        os.remove(upload.filepath)
+    db.delete(upload)
+    db.commit()
+    drop_repl_sessions(upload_id)
+
+
+# ---- Resumable multipart uploads ----
+#
+# POST   /upload/sessions                     -> open a session, returns part layout
+# PUT    /upload/sessions/{id}/parts/{n}      -> raw body of part n (1-based), idempotent
+# GET    /upload/sessions/{id}                -> received / missing part numbers
+# POST   /upload/sessions/{id}/complete       -> assemble parts and start processing
+# DELETE /upload/sessions/{id}                -> abort and discard received parts
+
+def _session_folder(session_id: str) -> str:
+    return os.path.join(SESSION_DIR, session_id)
+
+
+def _part_path(session_id: str, part_number: int) -> str:
+    return os.path.join(_session_folder(session_id), f"{part_number}.bin")
+
+
+def _expected_part_size(session: UploadSession, part_number: int) -> int:
+    if part_number < session.total_parts:
+        return session.part_size
+    return session.total_size - session.part_size * (session.total_parts - 1)
+
+
+def _received_parts(session: UploadSession) -> list[int]:
+    folder = _session_folder(session.id)
+    if not os.path.isdir(folder):
+        return []
+
+    received = []
+    for name in os.listdir(folder):
+        number, ext = os.path.splitext(name)
+        if ext == ".bin" and number.isdigit():
+            received.append(int(number))
+    return sorted(received)
+
+
+def _session_expired(session: UploadSession) -> bool:
+    return session.created_at < datetime.utcnow() - timedelta(seconds=UPLOAD_SESSION_TTL)
+
+
+def _sweep_expired_sessions(db: Session):
+    """Expire abandoned sessions and delete the parts they received."""
+    cutoff = datetime.utcnow() - timedelta(seconds=UPLOAD_SESSION_TTL)
+    stale = db.query(UploadSession).filter(
+        UploadSession.status == "open",
+        UploadSession.created_at < cutoff
+    ).all()
+    for session in stale:
+        session.status = "expired"
+    db.commit()
+    for session in stale:
+        shutil.rmtree(_session_folder(session.id), ignore_errors=True)
+
+
+def _get_open_session(db: Session, session_id: str, user_id: int) -> UploadSession:
+    session = db.query(UploadSession).filter(
+        UploadSession.id == session_id,
+        UploadSession.user_id == user_id
+    ).first()
+
+    if not session:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload session not found")
+    if session.status == "open" and _session_expired(session):
+        session.status = "expired"
+        db.commit()
+        shutil.rmtree(_session_folder(session.id), ignore_errors=True)
+    if session.status != "open":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload session is {session.status}"
+        )
+    return session
+
+
+def _session_state(session: UploadSession):
+    received = _received_parts(session)
+    received_set = set(received)
+    return {
+        "session_id": session.id,
+        "filename": session.filename,
+        "total_size": session.total_size,
+        "part_size": session.part_size,
+        "total_parts": session.total_parts,
+        "status": session.status,
+        "received_parts": received,
+        "missing_parts": [n for n in range(1, session.total_parts + 1) if n not in received_set],
+    }
+
+
+@router.post("/sessions", status_code=201)
+def create_upload_session(
+    body: UploadSessionCreate,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    _check_new_upload(db, current_user.id, body.filename, body.total_size)
+    _sweep_expired_sessions(db)
+
+    if body.total_size <= 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="total_size must be positive")
+
+    part_size = body.part_size or DEFAULT_PART_SIZE
+    part_size = max(MIN_PART_SIZE, min(part_size, MAX_PART_SIZE))
+
+    session = UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=current_user.id,
+        filename=body.filename,
+        total_size=body.total_size,
+        part_size=part_size,
+        total_parts=math.ceil(body.total_size / part_size),
+    )
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+
+    os.makedirs(_session_folder(session.id), exist_ok=True)
+
+    return _session_state(session)
+
+
+@router.get("/sessions/{session_id}")
+def get_upload_session(
+    session_id: str,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    session = db.query(UploadSession).filter(
+        UploadSession.id == session_id,
+        UploadSession.user_id == current_user.id
+    ).first()
+
+    if not session:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload session not found")
+
+    return _session_state(session)
+
+
+@router.put("/sessions/{session_id}/parts/{part_number}")
+async def upload_part(
+    session_id: str,
+    part_number: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    session = _get_open_session(db, session_id, current_user.id)
+
+    if part_number < 1 or part_number > session.total_parts:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"part_number must be between 1 and {session.total_parts}"
+        )
+
+    expected_size = _expected_part_size(session, part_number)
+    part_path = _part_path(session.id, part_number)
+
+    try:
+        size, _ = await write_stream(request.stream(), part_path, max_size=expected_size)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+
+    if size != expected_size:
+        os.remove(part_path)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Part {part_number} should be {expected_size} bytes, received {size}"
+        )
+
+    return {"session_id": session.id, "part_number": part_number, "size": size}
+
+
+@router.post("/sessions/{session_id}/complete", status_code=202)
+async def complete_upload_session(
+    session_id: str,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    session = _get_open_session(db, session_id, current_user.id)
+
+    state = _session_state(session)
+    if state["missing_parts"]:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Upload is incomplete", "missing_parts": state["missing_parts"]}
+        )
+
+    _check_new_upload(db, current_user.id, session.filename)
+
+    file_path = staging_path()
+
+    # Claim the session so a retried /complete cannot assemble it twice.
+    session.status = "assembling"
+    db.commit()
+
+    part_paths = [_part_path(session.id, n) for n in range(1, session.total_parts + 1)]
+    try:
+        size, content_hash = await run_in_threadpool(concat_files, part_paths, file_path)
+    except Exception as e:
+        session.status = "open"
+        db.commit()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error assembling file: {str(e)}"
+        )
+
+    session.status = "completed"
+    db.commit()
+    await run_in_threadpool(shutil.rmtree, _session_folder(session.id), True)
+
+    return _register_upload(db, current_user.id, session.filename, file_path, size, content_hash)
+
+
+@router.delete("/sessions/{session_id}", status_code=204)
+async def abort_upload_session(
+    session_id: str,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    session = _get_open_session(db, session_id, current_user.id)
+
+    session.status = "aborted"
+    db.commit()
+    await run_in_threadpool(shutil.rmtree, _session_folder(session.id), True)
@@ -0,0 +1,204 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+
+class KLLSketch:
+    """
+    Mergeable quantile sketch (Karnin, Lang and Liberty, 2016).
+
+    Items live in levels of compactors; an item at level h stands for 2**h
+    inputs. When a level overflows it is sorted and every other item is
+    promoted, so the sketch holds O(k log(n/k)) items.
+    """
+
+    def __init__(self, k: int = 200, seed: int = 0):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def rank_error(self) -> float:
+        # Empirical normalized rank error for single quantile queries (DataSketches).
+        return 2.296 / self.k ** 0.9723
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                keep = items[:1] if len(items) % 2 else items[:0]
+                if len(keep):
+                    items = items[1:]
+                promoted = items[self._rng.integers(2)::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                # Capacities depend on the number of levels; start over.
+                level = 0
+                continue
+            level += 1
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other: "KLLSketch"):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self._compress()
+
+    def quantiles(self, qs):
+        if self.n == 0:
+            return [None for _ in qs]
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** h) for h, items in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        items, cumulative = items[order], np.cumsum(weights[order])
+        total = cumulative[-1]
+        return [float(items[min(np.searchsorted(cumulative, q * total), len(items) - 1)]) for q in qs]
+
+    def to_state(self):
+        return {
+            "items": np.concatenate(self.levels),
+            "level_sizes": np.array([len(items) for items in self.levels], dtype=np.int64),
+            "meta": {"k": self.k, "n": self.n},
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(k=state["meta"]["k"])
+        sketch.n = state["meta"]["n"]
+        bounds = np.cumsum(state["level_sizes"])[:-1]
+        sketch.levels = list(np.split(state["items"], bounds))
+        return sketch
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """Vectorized int.bit_length() for uint64 arrays."""
+    hi = (values >> np.uint64(32)).astype(np.float64)
+    lo = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    with np.errstate(divide="ignore"):
+        hi_bits = np.where(hi > 0, np.floor(np.log2(hi)) + 1, 0)
+        lo_bits = np.where(lo > 0, np.floor(np.log2(lo)) + 1, 0)
+    return np.where(hi > 0, 32 + hi_bits, lo_bits).astype(np.int64)
+
+
+def hash_values(series: pd.Series) -> np.ndarray:
+    return pd.util.hash_pandas_object(series.dropna(), index=False).to_numpy(dtype=np.uint64)
+
+
+class HyperLogLog:
+    """
+    Mergeable distinct-count sketch (Flajolet et al., 2007) over 64-bit hashes,
+    with linear counting for small cardinalities.
+    """
+
+    def __init__(self, p: int = 14):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def update_hashes(self, hashes: np.ndarray):
+        if not len(hashes):
+            return
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = hashes << np.uint64(self.p)
+        rank = np.minimum(64 - _bit_length(rest) + 1, 64 - self.p + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_state(self):
+        return {"registers": self.registers, "meta": {"p": self.p}}
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(p=state["meta"]["p"])
+        sketch.registers = state["registers"].astype(np.uint8)
+        return sketch
+
+
+class MisraGries:
+    """
+    Mergeable heavy-hitters summary keeping at most k counters. Every reported
+    count underestimates the true frequency by at most `error`.
+    """
+
+    def __init__(self, k: int = 64):
+        self.k = k
+        self.n = 0
+        self.counters = {}
+        self._decremented = 0
+
+    @property
+    def error(self) -> int:
+        return self._decremented
+
+    def _add(self, counts):
+        for value, count in counts.items():
+            self.counters[value] = self.counters.get(value, 0) + int(count)
+        if len(self.counters) > self.k:
+            cutoff = sorted(self.counters.values(), reverse=True)[self.k]
+            self._decremented += cutoff
+            self.counters = {v: c - cutoff for v, c in self.counters.items() if c > cutoff}
+
+    def update(self, series: pd.Series):
+        counts = series.dropna().value_counts()
+        counts = counts[counts > 0]  # categoricals also list unused categories
+        self.n += int(counts.sum())
+        self._add(counts)
+
+    def merge(self, other: "MisraGries"):
+        self.n += other.n
+        self._decremented += other._decremented
+        self._add(other.counters)
+
+    def top(self, limit: int = 10):
+        return sorted(self.counters.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def to_state(self):
+        return {"meta": {
+            "k": self.k,
+            "n": self.n,
+            "decremented": self._decremented,
+            "counters": [[value, count] for value, count in self.counters.items()],
+        }}
+
+    @classmethod
+    def from_state(cls, state):
+        meta = state["meta"]
+        sketch = cls(k=meta["k"])
+        sketch.n = meta["n"]
+        sketch._decremented = meta["decremented"]
+        sketch.counters = {value: count for value, count in meta["counters"]}
+        return sketch
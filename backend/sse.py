@@ -0,0 +1,138 @@
+import asyncio
+import json
+import os
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, Tuple
+
+from fastapi.responses import StreamingResponse
+
+SSE_COALESCE_MS = int(os.getenv("SSE_COALESCE_MS", "50"))
+SSE_COALESCE_CHARS = int(os.getenv("SSE_COALESCE_CHARS", "1024"))
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+
+# Events whose data is a JSON string of text; consecutive ones are merged.
+TEXT_EVENTS = {"message_chunk"}
+# A comment line: keeps proxies from timing the stream out and makes a write
+# happen regularly, which is how a closed connection is noticed.
+HEARTBEAT = ": ping\n\n"
+QUEUE_SIZE = 256
+
+_END = object()
+
+
+def format_event(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+async def _pump(events: AsyncIterator[Tuple[str, str]], queue: asyncio.Queue):
+    # aclosing: when cancelled while waiting on the queue, the source is
+    # suspended at a yield and has to be closed explicitly.
+    try:
+        async with aclosing(events):
+            async for item in events:
+                await queue.put(item)
+    except Exception as e:
+        await queue.put(e)
+    await queue.put(_END)
+
+
+async def stream_events(
+    events: AsyncIterator[Tuple[str, str]],
+    coalesce_ms: int = SSE_COALESCE_MS,
+    coalesce_chars: int = SSE_COALESCE_CHARS,
+    heartbeat_seconds: float = SSE_HEARTBEAT_SECONDS,
+):
+    """
+    SSE frames for an async generator of (event, data) pairs.
+
+    Text chunks are held for up to coalesce_ms, or until coalesce_chars have
+    built up, and sent as one frame; any other event flushes them first.
+    A heartbeat is sent after heartbeat_seconds without output.
+
+    The source runs in its own task. When the stream is closed early, which
+    is what happens when the client disconnects (see EventStreamResponse),
+    that task is cancelled: the source sees CancelledError at the point it
+    was waiting on and should stop its work there.
+    """
+    queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    producer = asyncio.create_task(_pump(events, queue))
+    getter = None
+    text = []
+    text_chars = 0
+    flush_at = None
+    last_sent = time.monotonic()
+
+    def flush():
+        nonlocal text, text_chars, flush_at, last_sent
+        frame = format_event("message_chunk", json.dumps("".join(text)))
+        text, text_chars, flush_at = [], 0, None
+        last_sent = time.monotonic()
+        return frame
+
+    try:
+        while True:
+            if getter is None:
+                getter = asyncio.ensure_future(queue.get())
+            deadline = last_sent + heartbeat_seconds
+            if flush_at is not None:
+                deadline = min(deadline, flush_at)
+            done, _ = await asyncio.wait({getter}, timeout=max(deadline - time.monotonic(), 0))
+            if not done:
+                if text:
+                    yield flush()
+                else:
+                    last_sent = time.monotonic()
+                    yield HEARTBEAT
+                continue
+
+            item, getter = getter.result(), None
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            event, data = item
+            if event in TEXT_EVENTS:
+                chunk = json.loads(data)
+                text.append(chunk)
+                text_chars += len(chunk)
+                if flush_at is None:
+                    flush_at = time.monotonic() + coalesce_ms / 1000
+                if text_chars >= coalesce_chars:
+                    yield flush()
+                continue
+            if text:
+                yield flush()
+            last_sent = time.monotonic()
+            yield format_event(event, data)
+        if text:
+            yield flush()
+    finally:
+        if getter is not None:
+            getter.cancel()
+        producer.cancel()
+        try:
+            await producer
+        except asyncio.CancelledError:
+            pass
+
+
+class EventStreamResponse(StreamingResponse):
+    """
+    StreamingResponse for server-sent events. The body is always closed when
+    the response ends, including when the client disconnected mid-stream, so
+    the work behind the stream stops right away instead of whenever the
+    generator is garbage collected.
+    """
+
+    media_type = "text/event-stream"
+
+    def __init__(self, events: AsyncIterator[Tuple[str, str]], **kwargs):
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **kwargs.pop("headers", {})}
+        super().__init__(stream_events(events), headers=headers, **kwargs)
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
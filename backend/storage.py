@@ -0,0 +1,173 @@
+import hashlib
+import os
+import shutil
+import uuid
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.models.dataset_object import DatasetObject
+
+CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(5 * 1024 ** 3)))
+
+UPLOAD_DIR = "uploads"
+STAGING_DIR = os.path.join(UPLOAD_DIR, ".staging")
+OBJECT_DIR = os.path.join(UPLOAD_DIR, "objects")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+async def write_stream(chunks, dest_path: str, max_size: int = MAX_UPLOAD_SIZE, buffer_size: int = CHUNK_SIZE):
+    """
+    Write an async iterator of byte chunks (e.g. Request.stream()) to dest_path.
+
+    Incoming chunks are buffered up to buffer_size and hashed and flushed from
+    a worker thread, so the event loop never blocks on disk I/O. The data is
+    written to a uniquely named temporary file next to the destination (see
+    tmp_path_for) and only renamed into place once complete: a failed or
+    rejected upload never leaves a truncated file behind, and a retried part
+    racing the original does not share its temporary file.
+
+    Returns:
+        tuple: (size in bytes, sha256 hex digest)
+
+    Raises:
+        UploadTooLarge: as soon as more than max_size bytes have been received.
+    """
+    hasher = hashlib.sha256()
+    tmp_path = tmp_path_for(dest_path)
+    size = 0
+    buffer = bytearray()
+    out = await run_in_threadpool(open, tmp_path, "wb")
+
+    def flush(data: bytes):
+        hasher.update(data)
+        out.write(data)
+
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_size:
+                raise UploadTooLarge(f"Upload exceeds the maximum size of {max_size} bytes")
+            buffer += chunk
+            if len(buffer) >= buffer_size:
+                await run_in_threadpool(flush, bytes(buffer))
+                buffer.clear()
+        if buffer:
+            await run_in_threadpool(flush, bytes(buffer))
+        await run_in_threadpool(out.close)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        out.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return size, hasher.hexdigest()
+
+
+def concat_files(part_paths, dest_path: str, chunk_size: int = CHUNK_SIZE):
+    """
+    Concatenate part files, in order, into dest_path.
+
+    Returns:
+        tuple: (size in bytes, sha256 hex digest) of the assembled file
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    tmp_path = tmp_path_for(dest_path)
+
+    try:
+        with open(tmp_path, "wb") as out:
+            for part_path in part_paths:
+                with open(part_path, "rb") as src:
+                    while True:
+                        chunk = src.read(chunk_size)
+                        if not chunk:
+                            break
+                        size += len(chunk)
+                        hasher.update(chunk)
+                        out.write(chunk)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return size, hasher.hexdigest()
+
+
+# ---- Content-addressed object store ----
+#
+# uploads/objects/<hash[:2]>/<hash>/data.csv holds the original bytes; derived
+# artifacts for the same content (columnar copies, indexes, ...) live next to
+# it, so they are shared by every upload of identical bytes.
+
+def tmp_path_for(path: str) -> str:
+    """
+    A unique temporary name next to path, to write to before os.replace.
+    Object directories are shared by every upload of the same bytes, so two
+    writers of the same artifact must not share a temporary file.
+    """
+    return f"{path}.{uuid.uuid4().hex}.tmp"
+
+
+def staging_path() -> str:
+    os.makedirs(STAGING_DIR, exist_ok=True)
+    return os.path.join(STAGING_DIR, f"{uuid.uuid4().hex}.csv")
+
+
+def object_dir(content_hash: str) -> str:
+    return os.path.join(OBJECT_DIR, content_hash[:2], content_hash)
+
+
+def object_path(content_hash: str) -> str:
+    return os.path.join(object_dir(content_hash), "data.csv")
+
+
+def store_object(db: Session, staged_path: str, size: int, content_hash: str) -> DatasetObject:
+    """
+    Move a staged file into the object store and take a reference on it.
+
+    If the content is already stored the staged copy is discarded. The caller
+    commits the session together with the Upload row that holds the reference.
+    """
+    obj = db.get(DatasetObject, content_hash)
+    if obj is None:
+        os.makedirs(object_dir(content_hash), exist_ok=True)
+        os.replace(staged_path, object_path(content_hash))
+        obj = DatasetObject(content_hash=content_hash, path=object_path(content_hash), size=size, ref_count=0)
+        db.add(obj)
+        try:
+            db.flush()
+        except IntegrityError:
+            # Another request stored the same bytes concurrently.
+            db.rollback()
+            obj = db.get(DatasetObject, content_hash)
+    else:
+        os.remove(staged_path)
+
+    obj.ref_count = DatasetObject.ref_count + 1
+    return obj
+
+
+def release_object(db: Session, content_hash: str):
+    """
+    Drop one reference; the stored file and its derived artifacts are removed
+    with the last one. Returns False if the content is not in the object store.
+    """
+    obj = db.get(DatasetObject, content_hash)
+    if obj is None:
+        return False
+
+    obj.ref_count = DatasetObject.ref_count - 1
+    db.flush()
+    db.refresh(obj)
+    if obj.ref_count <= 0:
+        db.delete(obj)
+        shutil.rmtree(object_dir(content_hash), ignore_errors=True)
+    return True
@@ -0,0 +1,22 @@
+from celery.utils.log import get_task_logger
+
+from backend.celery_app import celery_app
+from backend.chat_memory import compact_history
+from backend.database import SessionLocal
+
+logger = get_task_logger(__name__)
+
+
+@celery_app.task(name="backend.tasks.chat_tasks.compact_chat_memory")
+def compact_chat_memory(user_id, upload_id):
+    """Fold turns that left the prompt window into the conversation's rolling summary."""
+    db = SessionLocal()
+    try:
+        summary = compact_history(db, user_id, upload_id)
+        return {"covered_until_id": summary.covered_until_id if summary else None}
+    except Exception as e:
+        db.rollback()
+        logger.warning("Chat memory compaction failed for user %s upload %s: %s", user_id, upload_id, e)
+        return {"error": str(e)}
+    finally:
+        db.close()
@@ -1,62 +1,112 @@
-import pandas as pd
 import os
 import json
 from celery import shared_task
+from celery.utils.log import get_task_logger
 from backend.database import SessionLocal
 from backend.models.upload import Upload
 from backend.models.summary import Summary
-from backend.ai import call_groq_insights
+from backend.ai import call_groq_insights, insights_prompt
+from backend.datasets import build_row_index, convert_to_columnar, infer_schema
+from backend.profiling import profile_dataset, summary_for_upload
 
 from backend.celery_app import celery_app
 
+logger = get_task_logger(__name__)
+
+
+def _find_processed_summary(db, upload):
+    """
+    Returns a Summary produced for another upload of the same bytes, if any.
+    """
+    if not upload.content_hash:
+        return None
+    return (
+        db.query(Summary)
+        .join(Upload, Summary.upload_id == Upload.id)
+        .filter(
+            Upload.content_hash == upload.content_hash,
+            Upload.id != upload.id,
+            Upload.status == "completed",
+        )
+        .order_by(Summary.id.desc())
+        .first()
+    )
+
+
 @celery_app.task(bind=True, name="backend.tasks.data_tasks.process_file_task")
 def process_file_task(self, upload_id):
     db = SessionLocal()
+    upload = None
     try:
         self.update_state(state='PROGRESS', meta={'current': 10, 'total': 100, 'status': 'Starting processing...'})
-        
+
         upload = db.query(Upload).filter(Upload.id == upload_id).first()
         if not upload:
             return {"error": "Upload not found"}
 
-        self.update_state(state='PROGRESS', meta={'current': 20, 'total': 100, 'status': 'Loading CSV...'})
-        df = pd.read_csv(upload.filepath)
+        upload.status = "processing"
+        db.commit()
+
+        existing = _find_processed_summary(db, upload)
+        if existing:
+            new_summary = Summary(
+                upload_id=upload.id,
+                user_id=upload.user_id,
+                content_hash=upload.content_hash,
+                summary_json=summary_for_upload(existing.summary_json, upload),
+                insights_json=existing.insights_json,
+            )
+            db.add(new_summary)
+            upload.status = "completed"
+            db.commit()
+            self.update_state(state='PROGRESS', meta={'current': 100, 'total': 100, 'status': 'Completed (reused existing results)'})
+            return {"status": "completed", "upload_id": upload.id, "summary_id": new_summary.id, "deduplicated": True}
+
+        self.update_state(state='PROGRESS', meta={'current': 15, 'total': 100, 'status': 'Indexing rows...'})
+        try:
+            build_row_index(upload)
+        except Exception as e:
+            logger.warning("Row index build failed for upload %s: %s", upload.id, e)
+
+        self.update_state(state='PROGRESS', meta={'current': 18, 'total': 100, 'status': 'Inferring schema...'})
+        try:
+            infer_schema(upload)
+        except Exception as e:
+            # Without a stored schema, readers fall back to inferring types themselves.
+            logger.warning("Schema inference failed for upload %s: %s", upload.id, e)
+
+        self.update_state(state='PROGRESS', meta={'current': 20, 'total': 100, 'status': 'Converting to columnar format...'})
+        try:
+            convert_to_columnar(upload)
+        except Exception as e:
+            # Readers keep using the CSV; profiling below surfaces real parse errors.
+            logger.warning("Columnar conversion failed for upload %s: %s", upload.id, e)
 
         self.update_state(state='PROGRESS', meta={'current': 40, 'total': 100, 'status': 'Calculating statistics...'})
-        summary = {
-            "filename": upload.filename,
-            "shape": {"rows": df.shape[0], "columns": df.shape[1]},
-            "columns": df.columns.tolist(),
-            "missing_values": df.isnull().sum().to_dict(),
-            "data_types": df.dtypes.astype(str).to_dict(),
-            "stats": df.describe(include='all').fillna("").to_dict(),
-            "numeric_columns": df.select_dtypes(include="number").columns.tolist(),
-            "categorical_columns": df.select_dtypes(exclude="number").columns.tolist(),
-        }
-
-        if len(summary["numeric_columns"]) >= 2:
-            corr = df[summary["numeric_columns"]].corr().round(3).to_dict()
-            summary["correlation"] = corr
-
-        summary["sample_data"] = df.head(5).to_dict(orient="records")
-        summary_json = json.dumps(summary)
+        summary_json = json.dumps(profile_dataset(upload), default=str)
 
         self.update_state(state='PROGRESS', meta={'current': 70, 'total': 100, 'status': 'Generating AI insights...'})
-        prompt = f"Analyze this dataset summary and give 3 key insights:\n{summary_json}"
-        insights = call_groq_insights(prompt)
+        insights = call_groq_insights(insights_prompt(summary_json), user_id=upload.user_id)
 
         self.update_state(state='PROGRESS', meta={'current': 90, 'total': 100, 'status': 'Saving results...'})
-        new_summary = Summary(
-            upload_id=upload.id,
-            user_id=upload.user_id,
-            summary_json=summary_json
-        )
-        db.add(new_summary)
+        # /data/summary may have computed one on demand while we were running.
+        new_summary = db.query(Summary).filter(Summary.upload_id == upload.id).first()
+        if new_summary is None:
+            new_summary = Summary(upload_id=upload.id, user_id=upload.user_id)
+            db.add(new_summary)
+        new_summary.content_hash = upload.content_hash
+        new_summary.summary_json = summary_json
+        new_summary.insights_json = insights
+        upload.status = "completed"
         db.commit()
 
         self.update_state(state='PROGRESS', meta={'current': 100, 'total': 100, 'status': 'Completed'})
         return {"status": "completed", "upload_id": upload.id, "summary_id": new_summary.id}
     except Exception as e:
+        if upload is not None:
+            db.rollback()
+            upload.status = "failed"
+            db.commit()
         return {"status": "failed", "error": str(e)}
     finally:
         db.close()
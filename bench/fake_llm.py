@@ -0,0 +1,211 @@
+"""
+OpenAI-compatible stand-in for the Groq API, so the chat and insights
+pipelines can be load tested without spending quota.
+
+Serves POST /openai/v1/chat/completions, streaming or not. Requests that
+offer tools (the data agent) get the scenario's tool calls back, one per
+round trip, and then its answer; other requests get the insights list when
+they ask for JSON insights, and the summary text otherwise. Replies wait
+--first-token-ms before the first token and --token-ms between tokens.
+With --max-concurrent, requests beyond it are rejected with 429 like a rate
+limited provider.
+
+    python bench/fake_llm.py --port 9000
+    GROQ_BASE_URL=http://127.0.0.1:9000 GROQ_API_KEY=fake uvicorn backend.main:app
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_SCENARIO = {
+    "tool_calls": [
+        {"name": "python_interpreter", "arguments": {"query": "print(df.shape)\nprint(df.dtypes)"}},
+    ],
+    "answer": (
+        "The dataset loads cleanly. Its numeric columns have no extreme outliers, the categorical "
+        "columns are dominated by a handful of frequent values, and missing values are rare. A good "
+        "next step is to break the main numeric measure down by the most frequent category and to "
+        "check how it changes over time, if the data has a date column."
+    ),
+    "insights": [
+        "Most rows fall into a small number of categories.",
+        "Numeric columns are moderately skewed to the right.",
+        "Missing values are concentrated in a few columns.",
+    ],
+    "summary": "The user explored the dataset's shape, column types and main distributions.",
+}
+
+app = FastAPI(title="Fake LLM")
+config = {"first_token_ms": 300, "token_ms": 20, "jitter": 0.0, "max_concurrent": 0, "scenario": DEFAULT_SCENARIO}
+stats = {"requests": 0, "streamed": 0, "tool_call_replies": 0, "tokens": 0, "rejected": 0}
+in_flight = 0
+
+
+def _tokens(text: str):
+    return re.findall(r"\S+\s*", text)
+
+
+def _delay(ms: float):
+    jitter = config["jitter"]
+    return max(ms * (1 + random.uniform(-jitter, jitter)), 0) / 1000
+
+
+def _pending_tool_call(body: dict):
+    """The scenario's next tool call for an agent request, or None once they are all answered."""
+    if not body.get("tools"):
+        return None
+    messages = body.get("messages", [])
+    last_user = max((i for i, message in enumerate(messages) if message.get("role") == "user"), default=-1)
+    done = sum(1 for message in messages[last_user + 1:] if message.get("role") == "assistant" and message.get("tool_calls"))
+    calls = config["scenario"]["tool_calls"]
+    return calls[done] if done < len(calls) else None
+
+
+def _reply_text(body: dict) -> str:
+    prompt = " ".join(str(message.get("content") or "") for message in body.get("messages", []))
+    scenario = config["scenario"]
+    if body.get("tools"):
+        return scenario["answer"]
+    if "insight" in prompt.lower():
+        return json.dumps(scenario["insights"])
+    return scenario["summary"]
+
+
+def _usage(body: dict, completion: str) -> dict:
+    prompt_tokens = sum(len(str(message.get("content") or "")) for message in body.get("messages", [])) // 4
+    completion_tokens = len(completion) // 4 + 1
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+def _chunk(completion_id: str, model: str, delta: dict, finish_reason=None, usage=None) -> str:
+    chunk = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason, "logprobs": None}],
+    }
+    if usage is not None:
+        chunk["usage"] = usage
+        chunk["x_groq"] = {"id": completion_id, "usage": usage}
+    return f"data: {json.dumps(chunk)}\n\n"
+
+
+async def _stream(body: dict, completion_id: str, tool_call):
+    global in_flight
+    model = body.get("model", "fake")
+    try:
+        yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+        await asyncio.sleep(_delay(config["first_token_ms"]))
+        if tool_call is not None:
+            arguments = json.dumps(tool_call["arguments"])
+            yield _chunk(completion_id, model, {"tool_calls": [{
+                "index": 0,
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {"name": tool_call["name"], "arguments": arguments},
+            }]})
+            yield _chunk(completion_id, model, {}, "tool_calls", _usage(body, arguments))
+        else:
+            text = _reply_text(body)
+            for i, token in enumerate(_tokens(text)):
+                if i:
+                    await asyncio.sleep(_delay(config["token_ms"]))
+                stats["tokens"] += 1
+                yield _chunk(completion_id, model, {"content": token})
+            yield _chunk(completion_id, model, {}, "stop", _usage(body, text))
+        yield "data: [DONE]\n\n"
+    finally:
+        in_flight -= 1
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    global in_flight
+    body = await request.json()
+    stats["requests"] += 1
+    if config["max_concurrent"] and in_flight >= config["max_concurrent"]:
+        stats["rejected"] += 1
+        return JSONResponse(
+            status_code=429,
+            headers={"retry-after": "1"},
+            content={"error": {"message": "Rate limit reached", "type": "tokens", "code": "rate_limit_exceeded"}},
+        )
+    in_flight += 1
+
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    tool_call = _pending_tool_call(body)
+    if tool_call is not None:
+        stats["tool_call_replies"] += 1
+    if body.get("stream"):
+        stats["streamed"] += 1
+        return StreamingResponse(_stream(body, completion_id, tool_call), media_type="text/event-stream")
+
+    try:
+        if tool_call is not None:
+            await asyncio.sleep(_delay(config["first_token_ms"]))
+            arguments = json.dumps(tool_call["arguments"])
+            message = {"role": "assistant", "content": None, "tool_calls": [{
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {"name": tool_call["name"], "arguments": arguments},
+            }]}
+            finish_reason, usage = "tool_calls", _usage(body, arguments)
+        else:
+            text = _reply_text(body)
+            tokens = _tokens(text)
+            await asyncio.sleep(_delay(config["first_token_ms"]) + _delay(config["token_ms"]) * (len(tokens) - 1))
+            stats["tokens"] += len(tokens)
+            message = {"role": "assistant", "content": text}
+            finish_reason, usage = "stop", _usage(body, text)
+    finally:
+        in_flight -= 1
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason, "logprobs": None}],
+        "usage": usage,
+    }
+
+
+@app.get("/stats")
+def get_stats():
+    return {**stats, "in_flight": in_flight}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--first-token-ms", type=float, default=config["first_token_ms"])
+    parser.add_argument("--token-ms", type=float, default=config["token_ms"])
+    parser.add_argument("--jitter", type=float, default=0.0, help="relative random variation of the delays, e.g. 0.2")
+    parser.add_argument("--max-concurrent", type=int, default=0, help="reject requests beyond this many with 429")
+    parser.add_argument("--scenario", help="JSON file overriding tool_calls, answer, insights and summary")
+    args = parser.parse_args()
+
+    config.update(
+        first_token_ms=args.first_token_ms,
+        token_ms=args.token_ms,
+        jitter=args.jitter,
+        max_concurrent=args.max_concurrent,
+    )
+    if args.scenario:
+        with open(args.scenario) as f:
+            config["scenario"] = {**DEFAULT_SCENARIO, **json.load(f)}
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+End-to-end latency benchmark for POST /chat/ and POST /ai/insights/{id}
+under concurrent load.
+
+Signs up --users fresh users, uploads --csv for each and waits for
+processing, then sends --requests chat questions and --insights-requests
+insights requests with --concurrency in flight. Reports p50/p90/p99
+end-to-end latency, time to first token, streamed tokens per second
+(estimated at four characters per token), tool calls per answer and how
+many requests had to queue for admission.
+
+Run the API against bench/fake_llm.py to measure the pipeline without
+spending quota:
+
+    python bench/fake_llm.py --port 9000 &
+    GROQ_BASE_URL=http://127.0.0.1:9000 GROQ_API_KEY=fake ./start_app.sh
+    python bench/run_bench.py --csv data.csv --users 4 --requests 200 --concurrency 32
+
+Chat answers to repeated opening questions are served from the answer
+cache, so each question gets a unique suffix unless --same-question is
+given. Insights are generated at ingest and stored with the summary, so
+by default that endpoint measures serving them; --regenerate-insights
+asks for fresh ones each time, loading the model call and its admission.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+import uuid
+
+import httpx
+
+CHARS_PER_TOKEN = 4
+
+
+def percentile(values, q: float):
+    if not values:
+        return None
+    # Nearest rank.
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q / 100 * len(ordered)), 1) - 1]
+
+
+async def create_user(client: httpx.AsyncClient, csv_path: str, timeout: float):
+    email = f"bench_{uuid.uuid4().hex[:10]}@example.com"
+    response = await client.post("/auth/signup", json={"email": email, "password": "bench-password", "role": "user"})
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    with open(csv_path, "rb") as f:
+        response = await client.post("/upload/", params={"filename": os.path.basename(csv_path)},
+                                     content=f.read(), headers=headers)
+    response.raise_for_status()
+    upload = response.json()
+
+    task_id = upload.get("task_id")
+    deadline = time.monotonic() + timeout
+    while task_id:
+        state = (await client.get(f"/tasks/{task_id}")).json()
+        if state["status"] == "completed":
+            break
+        if state["status"] == "failed":
+            raise RuntimeError(f"processing failed: {state.get('result')}")
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"upload {upload['upload_id']} still processing after {timeout:g}s")
+        await asyncio.sleep(1)
+    return headers, upload["upload_id"]
+
+
+async def chat_once(client: httpx.AsyncClient, headers: dict, dataset_id: int, question: str):
+    result = {"ok": False, "ttft": None, "tokens": 0, "tool_calls": 0, "queued": False, "cached": False}
+    started = time.monotonic()
+    first_chunk = None
+    text = []
+    event = None
+    async with client.stream("POST", "/chat/", json={"dataset_id": dataset_id, "message": question},
+                             headers=headers) as response:
+        if response.status_code != 200:
+            result["error"] = f"HTTP {response.status_code}"
+            return result
+        async for line in response.aiter_lines():
+            if line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:"):
+                data = line[5:].strip()
+                if event == "message_chunk":
+                    if first_chunk is None:
+                        first_chunk = time.monotonic()
+                    text.append(json.loads(data))
+                elif event == "queue":
+                    result["queued"] = True
+                elif event == "done":
+                    done = json.loads(data)
+                    result.update(ok=True, tool_calls=done.get("tool_calls", 0), cached=done.get("cached", False))
+                elif event == "error":
+                    result["error"] = data
+    finished = time.monotonic()
+    result["latency"] = finished - started
+    if not result["ok"]:
+        result.setdefault("error", "stream ended without a done event")
+    if first_chunk is not None:
+        result["ttft"] = first_chunk - started
+        result["tokens"] = len("".join(text)) // CHARS_PER_TOKEN
+        if finished > first_chunk:
+            result["tokens_per_second"] = result["tokens"] / (finished - first_chunk)
+    return result
+
+
+async def insights_once(client: httpx.AsyncClient, headers: dict, dataset_id: int, regenerate: bool):
+    started = time.monotonic()
+    params = {"refresh": "true"} if regenerate else None
+    response = await client.post(f"/ai/insights/{dataset_id}", params=params, headers=headers)
+    result = {"ok": response.status_code == 200, "latency": time.monotonic() - started}
+    if not result["ok"]:
+        result["error"] = f"HTTP {response.status_code}"
+    return result
+
+
+async def run_load(total: int, concurrency: int, make_request):
+    results = []
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            try:
+                results.append(await make_request(i))
+            except Exception as e:
+                results.append({"ok": False, "error": f"{type(e).__name__}: {e}"})
+
+    started = time.monotonic()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results, time.monotonic() - started
+
+
+def _ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.0f}"
+
+
+def report(name: str, results, elapsed: float):
+    ok = [r for r in results if r["ok"]]
+    latencies = [r["latency"] for r in ok]
+    summary = {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else None,
+        "latency_ms": {q: _ms(percentile(latencies, q)) for q in (50, 90, 99)},
+    }
+    print(f"\n{name}: {len(ok)}/{len(results)} ok in {elapsed:.1f}s ({summary['throughput_rps']} req/s)")
+    print(f"  end-to-end ms    p50 {summary['latency_ms'][50]}  p90 {summary['latency_ms'][90]}  "
+          f"p99 {summary['latency_ms'][99]}")
+
+    if any("ttft" in r for r in results):
+        ttfts = [r["ttft"] for r in ok if r["ttft"] is not None]
+        rates = [r["tokens_per_second"] for r in ok if r.get("tokens_per_second")]
+        tool_calls = [r["tool_calls"] for r in ok]
+        summary.update(
+            ttft_ms={q: _ms(percentile(ttfts, q)) for q in (50, 90, 99)},
+            tokens_per_second_p50=round(percentile(rates, 50), 1) if rates else None,
+            tool_calls_mean=round(sum(tool_calls) / len(tool_calls), 2) if tool_calls else None,
+            queued=sum(1 for r in ok if r["queued"]),
+            cached=sum(1 for r in ok if r["cached"]),
+        )
+        print(f"  first token ms   p50 {summary['ttft_ms'][50]}  p90 {summary['ttft_ms'][90]}  "
+              f"p99 {summary['ttft_ms'][99]}")
+        print(f"  tokens/s p50 {summary['tokens_per_second_p50']}  tool calls/answer {summary['tool_calls_mean']}  "
+              f"queued {summary['queued']}  cached {summary['cached']}")
+
+    errors = {}
+    for r in results:
+        if not r["ok"]:
+            errors[r.get("error", "unknown")] = errors.get(r.get("error", "unknown"), 0) + 1
+    for error, count in sorted(errors.items(), key=lambda item: -item[1])[:5]:
+        print(f"  {count} x {error[:200]}")
+    summary["error_samples"] = errors
+    return summary
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.concurrency + 8)
+    async with httpx.AsyncClient(base_url=args.api, timeout=args.timeout, limits=limits) as client:
+        print(f"Setting up {args.users} users with {args.csv}...")
+        users = await asyncio.gather(*(create_user(client, args.csv, args.timeout) for _ in range(args.users)))
+
+        summaries = {}
+        if args.requests:
+            def ask(i):
+                headers, dataset_id = users[i % len(users)]
+                question = args.question if args.same_question else f"{args.question} (request {i})"
+                return chat_once(client, headers, dataset_id, question)
+
+            results, elapsed = await run_load(args.requests, args.concurrency, ask)
+            summaries["chat"] = report("POST /chat/", results, elapsed)
+
+        if args.insights_requests:
+            def insights(i):
+                headers, dataset_id = users[i % len(users)]
+                return insights_once(client, headers, dataset_id, args.regenerate_insights)
+
+            results, elapsed = await run_load(args.insights_requests, args.concurrency, insights)
+            summaries["insights"] = report("POST /ai/insights/{id}", results, elapsed)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summaries, f, indent=2)
+    return 1 if any(summary["errors"] for summary in summaries.values()) else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api", default="http://127.0.0.1:8000")
+    parser.add_argument("--csv", required=True, help="dataset each benchmark user uploads")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=100, help="chat requests in total")
+    parser.add_argument("--insights-requests", type=int, default=100)
+    parser.add_argument("--regenerate-insights", action="store_true",
+                        help="have every insights request call the model instead of returning the stored insights")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--question", default="What are the main patterns in this dataset?")
+    parser.add_argument("--same-question", action="store_true", help="let repeated questions hit the answer cache")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--json", help="also write the results to this file")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -3,6 +3,7 @@ import requests
 import pandas as pd
 from config import API_URL
 from utils.auth import get_auth_headers
+from utils.upload import upload_in_parts
 
 st.set_page_config(page_title="Upload Data", page_icon="📂")
 
@@ -25,21 +26,23 @@ def upload_page():
                     status_text = st.empty()
                     
                     try:
-                        # Reset file pointer to beginning
-                        uploaded_file.seek(0)
-                        files = {"file": (uploaded_file.name, uploaded_file, "text/csv")}
-                        headers = get_auth_headers()
-                        
-                        response = requests.post(
-                            f"{API_URL}/upload/",
-                            files=files,
-                            headers=headers
-                        )
+                        def on_part_sent(done, total):
+                            progress_bar.progress(done / total)
+                            status_text.text(f"Uploading: part {done}/{total}")
+
+                        response = upload_in_parts(uploaded_file, on_progress=on_part_sent)
                         
                         if response.status_code == 202:
                             data = response.json()
                             task_id = data.get("task_id")
                             upload_id = data.get("upload_id")
+
+                            if data.get("status") == "completed":
+                                # Identical content was processed before; nothing to wait for.
+                                progress_bar.progress(1.0)
+                                st.success(f"✅ {uploaded_file.name} Complete! (reused existing analysis)")
+                                st.session_state["last_upload_id"] = upload_id
+                                continue
                             
                             # SSE Client to listen for progress
                             try:
@@ -71,7 +74,7 @@ def upload_page():
                             except Exception as e:
                                 st.error(f"Error tracking progress for {uploaded_file.name}: {str(e)}")
                                 
-                        elif response.status_code == 400:
+                        elif response.status_code in (400, 409, 413):
                             st.error(f"Upload failed for {uploaded_file.name}: {response.json().get('detail')}")
                         else:
                             st.error(f"An error occurred with {uploaded_file.name}: {response.text}")
@@ -1,3 +1,4 @@
+import json
 import streamlit as st
 import requests
 import pandas as pd
@@ -8,6 +9,24 @@ from utils.auth import get_auth_headers
 
 st.set_page_config(page_title="Data Summary", page_icon="📊", layout="wide")
 
+NDJSON_BATCH_ROWS = 5000
+
+
+def read_ndjson(response):
+    """Build a frame from an NDJSON response as its lines arrive, a batch of rows at a time."""
+    frames, rows = [], []
+    for line in response.iter_lines():
+        if not line:
+            continue
+        rows.append(json.loads(line))
+        if len(rows) >= NDJSON_BATCH_ROWS:
+            frames.append(pd.DataFrame.from_records(rows))
+            rows = []
+    if rows or not frames:
+        frames.append(pd.DataFrame.from_records(rows))
+    return pd.concat(frames, ignore_index=True)
+
+
 def data_summary_page():
     st.title("📊 Data Summary & Visualization")
     
@@ -43,10 +62,19 @@ def data_summary_page():
             
             if st.button("Analyze Dataset", type="primary"):
                 with st.spinner("Fetching summary..."):
-                    summary_response = requests.get(f"{API_URL}/data/summary/{upload_id}", headers=headers)
+                    cache = st.session_state.setdefault("summary_cache", {})
+                    request_headers = dict(headers)
+                    if upload_id in cache:
+                        request_headers["If-None-Match"] = cache[upload_id]["etag"]
+
+                    summary_response = requests.get(f"{API_URL}/data/summary/{upload_id}", headers=request_headers)
                     
-                    if summary_response.status_code == 200:
+                    if summary_response.status_code == 304:
+                        render_summary(cache[upload_id]["summary"], upload_id)
+                    elif summary_response.status_code == 200:
                         summary = summary_response.json()
+                        if summary_response.headers.get("ETag"):
+                            cache[upload_id] = {"etag": summary_response.headers["ETag"], "summary": summary}
                         render_summary(summary, upload_id)
                     else:
                         st.error(f"Failed to fetch summary: {summary_response.text}")
@@ -107,13 +135,13 @@ def render_summary(summary, upload_id):
             with st.spinner("Loading data..."):
                 try:
                     headers = get_auth_headers()
-                    response = requests.get(f"{API_URL}/data/content/{upload_id}", headers=headers)
-                    if response.status_code == 200:
-                        data = response.json()
-                        df = pd.DataFrame(data)
-                        st.dataframe(df, width="stretch")
-                    else:
-                        st.error(f"Failed to load data: {response.text}")
+                    headers["Accept"] = "application/x-ndjson"
+                    with requests.get(f"{API_URL}/data/content/{upload_id}", headers=headers, stream=True) as response:
+                        if response.status_code == 200:
+                            df = read_ndjson(response)
+                            st.dataframe(df, width="stretch")
+                        else:
+                            st.error(f"Failed to load data: {response.text}")
                 except Exception as e:
                     st.error(f"Error loading data: {str(e)}")
 
@@ -0,0 +1,91 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+import streamlit as st
+from config import API_URL
+from utils.auth import get_auth_headers
+
+PARALLEL_PARTS = 4
+MAX_PART_RETRIES = 5
+
+
+def _open_session(uploaded_file, headers):
+    """
+    Returns an open upload session for this file, reusing one from an earlier
+    attempt in this browser session so already-sent parts are not re-sent.
+    On failure the error response is returned instead.
+    """
+    sessions = st.session_state.setdefault("upload_sessions", {})
+    key = f"{uploaded_file.name}:{uploaded_file.size}"
+
+    session_id = sessions.get(key)
+    if session_id:
+        response = requests.get(f"{API_URL}/upload/sessions/{session_id}", headers=headers)
+        if response.status_code == 200 and response.json()["status"] == "open":
+            return response.json()
+
+    response = requests.post(
+        f"{API_URL}/upload/sessions",
+        json={"filename": uploaded_file.name, "total_size": uploaded_file.size},
+        headers=headers
+    )
+    if response.status_code != 201:
+        return response
+    session = response.json()
+    sessions[key] = session["session_id"]
+    return session
+
+
+def _read_part(uploaded_file, session, part_number):
+    start = (part_number - 1) * session["part_size"]
+    # UploadedFile is a BytesIO; getbuffer() gives a zero-copy view.
+    return uploaded_file.getbuffer()[start:start + session["part_size"]]
+
+
+def _send_part(session_id, part_number, data, headers):
+    url = f"{API_URL}/upload/sessions/{session_id}/parts/{part_number}"
+    for attempt in range(MAX_PART_RETRIES):
+        try:
+            response = requests.put(url, data=bytes(data), headers=headers)
+            if response.status_code == 200:
+                return part_number
+            if response.status_code < 500:
+                raise RuntimeError(response.json().get("detail", response.text))
+        except requests.ConnectionError:
+            pass
+        time.sleep(2 ** attempt)
+    raise RuntimeError(f"Part {part_number} failed after {MAX_PART_RETRIES} attempts")
+
+
+def upload_in_parts(uploaded_file, on_progress=None):
+    """
+    Uploads a file through the resumable session API, sending missing parts
+    in parallel and retrying failed parts individually.
+
+    Returns the response of /complete (same shape as POST /upload/).
+    """
+    headers = get_auth_headers()
+    session = _open_session(uploaded_file, headers)
+    if isinstance(session, requests.Response):
+        return session
+    session_id = session["session_id"]
+
+    missing = session["missing_parts"]
+    done = session["total_parts"] - len(missing)
+
+    with ThreadPoolExecutor(max_workers=PARALLEL_PARTS) as pool:
+        futures = [
+            pool.submit(_send_part, session_id, n, _read_part(uploaded_file, session, n), headers)
+            for n in missing
+        ]
+        for future in as_completed(futures):
+            future.result()
+            done += 1
+            if on_progress:
+                on_progress(done, session["total_parts"])
+
+    response = requests.post(f"{API_URL}/upload/sessions/{session_id}/complete", headers=headers)
+    if response.status_code == 202:
+        st.session_state["upload_sessions"].pop(f"{uploaded_file.name}:{uploaded_file.size}", None)
+    return response
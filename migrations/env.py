@@ -19,7 +19,7 @@ if config.config_file_name is not None:
 
 # Import your models and get the Base metadata
 from backend.database import Base
-from backend.models import upload, summary, user  # Import all your models
+from backend.models import upload, summary, user, chat, upload_session, dataset_object, tool_artifact  # Import all your models
 
 target_metadata = Base.metadata
 
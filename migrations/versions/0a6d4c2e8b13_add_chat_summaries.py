@@ -0,0 +1,32 @@
+"""Add chat_summaries for rolling conversation memory
+
+Revision ID: 0a6d4c2e8b13
+Revises: f2c7a91d4e6b
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0a6d4c2e8b13'
+down_revision = 'f2c7a91d4e6b'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'chat_summaries',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('upload_id', sa.Integer(), sa.ForeignKey('uploads.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('summary', sa.Text(), nullable=False),
+        sa.Column('covered_until_id', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.UniqueConstraint('user_id', 'upload_id', name='uq_chat_summaries_user_upload'),
+    )
+    op.create_index('ix_chat_summaries_id', 'chat_summaries', ['id'])
+
+def downgrade():
+    op.drop_index('ix_chat_summaries_id', table_name='chat_summaries')
+    op.drop_table('chat_summaries')
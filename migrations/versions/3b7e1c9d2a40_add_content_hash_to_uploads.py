@@ -0,0 +1,25 @@
+"""Add content_hash to uploads
+
+Revision ID: 3b7e1c9d2a40
+Revises: [your_revision_id]
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '3b7e1c9d2a40'
+down_revision = '[your_revision_id]'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('uploads') as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.create_index('ix_uploads_content_hash', ['content_hash'])
+
+def downgrade():
+    with op.batch_alter_table('uploads') as batch_op:
+        batch_op.drop_index('ix_uploads_content_hash')
+        batch_op.drop_column('content_hash')
@@ -0,0 +1,33 @@
+"""Add upload_sessions table
+
+Revision ID: 8d2f5a61c0b7
+Revises: 3b7e1c9d2a40
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '8d2f5a61c0b7'
+down_revision = '3b7e1c9d2a40'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'upload_sessions',
+        sa.Column('id', sa.String(length=32), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('filename', sa.String(), nullable=False),
+        sa.Column('total_size', sa.Integer(), nullable=False),
+        sa.Column('part_size', sa.Integer(), nullable=False),
+        sa.Column('total_parts', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False, server_default='open'),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_upload_sessions_id', 'upload_sessions', ['id'])
+
+def downgrade():
+    op.drop_index('ix_upload_sessions_id', table_name='upload_sessions')
+    op.drop_table('upload_sessions')
@@ -0,0 +1,36 @@
+"""Add content-addressed dataset_objects and stored insights
+
+Revision ID: c41a9e07f3d2
+Revises: 8d2f5a61c0b7
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c41a9e07f3d2'
+down_revision = '8d2f5a61c0b7'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'dataset_objects',
+        sa.Column('content_hash', sa.String(length=64), primary_key=True),
+        sa.Column('path', sa.String(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_dataset_objects_content_hash', 'dataset_objects', ['content_hash'])
+
+    with op.batch_alter_table('summaries') as batch_op:
+        batch_op.add_column(sa.Column('insights_json', sa.Text(), nullable=True))
+
+def downgrade():
+    with op.batch_alter_table('summaries') as batch_op:
+        batch_op.drop_column('insights_json')
+
+    op.drop_index('ix_dataset_objects_content_hash', table_name='dataset_objects')
+    op.drop_table('dataset_objects')
@@ -0,0 +1,31 @@
+"""Add content_hash to summaries
+
+Revision ID: e5b0d3a8f914
+Revises: c41a9e07f3d2
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e5b0d3a8f914'
+down_revision = 'c41a9e07f3d2'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('summaries') as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.create_index('ix_summaries_content_hash', ['content_hash'])
+
+    # Backfill from the uploads that already carry a hash.
+    op.execute(
+        "UPDATE summaries SET content_hash = "
+        "(SELECT uploads.content_hash FROM uploads WHERE uploads.id = summaries.upload_id)"
+    )
+
+def downgrade():
+    with op.batch_alter_table('summaries') as batch_op:
+        batch_op.drop_index('ix_summaries_content_hash')
+        batch_op.drop_column('content_hash')
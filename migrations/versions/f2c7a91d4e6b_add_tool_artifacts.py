@@ -0,0 +1,34 @@
+"""Add tool_artifacts for spilled agent tool output
+
+Revision ID: f2c7a91d4e6b
+Revises: e5b0d3a8f914
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'f2c7a91d4e6b'
+down_revision = 'e5b0d3a8f914'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'tool_artifacts',
+        sa.Column('id', sa.String(length=32), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('upload_id', sa.Integer(), sa.ForeignKey('uploads.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('tool_name', sa.String(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_tool_artifacts_user_id', 'tool_artifacts', ['user_id'])
+    op.create_index('ix_tool_artifacts_upload_id', 'tool_artifacts', ['upload_id'])
+
+def downgrade():
+    op.drop_index('ix_tool_artifacts_upload_id', table_name='tool_artifacts')
+    op.drop_index('ix_tool_artifacts_user_id', table_name='tool_artifacts')
+    op.drop_table('tool_artifacts')
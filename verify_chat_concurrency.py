@@ -0,0 +1,143 @@
+"""
+Checks that chat streams keep flowing while another chat request is stuck on
+heavy I/O: its database is locked by another connection and its dataset is
+a large CSV that has to be parsed on first use.
+
+The agent is replaced by a fake that streams a fixed answer, so no API key or
+Redis is needed. Run from the repository root:
+
+    python verify_chat_concurrency.py
+"""
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+# Load datasets in the API process (in its threadpool) instead of a tool worker.
+os.environ["TOOL_WORKERS"] = "0"
+# The fake agent never calls the API; the clients only need a key to be built.
+os.environ.setdefault("GROQ_API_KEY", "unused")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import backend.chat_service as chat_service
+from backend.database import Base
+from backend.models.upload import Upload
+
+FAST_STREAMS = 8
+CHUNKS = 40
+CHUNK_INTERVAL = 0.02
+LOCK_SECONDS = 2.0
+BIG_ROWS = 2_000_000
+MAX_LOOP_LAG = 0.25
+
+
+class FakeAgent:
+    async def astream_events(self, state, version):
+        yield {"event": "on_chain_start", "name": "LangGraph", "data": {}}
+        for i in range(CHUNKS):
+            await asyncio.sleep(CHUNK_INTERVAL)
+            yield {"event": "on_chat_model_stream", "name": "chatbot",
+                   "data": {"chunk": SimpleNamespace(content=f"token{i} ")}}
+
+
+def make_database(path: str, csv_path: str):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    with Session() as db:
+        db.add(Upload(id=1, user_id=1, filename=os.path.basename(csv_path), filepath=csv_path,
+                      size=os.path.getsize(csv_path), status="processed"))
+        db.commit()
+    return Session
+
+
+def hold_lock(path: str, locked: threading.Event):
+    conn = sqlite3.connect(path)
+    conn.execute("BEGIN EXCLUSIVE")
+    locked.set()
+    time.sleep(LOCK_SECONDS)
+    conn.rollback()
+    conn.close()
+
+
+async def consume(Session, question: str):
+    chunk_times = []
+    done = None
+    with Session() as db:
+        async for event, data in chat_service.stream_chat_process(db, 1, 1, question):
+            if event == "message_chunk":
+                chunk_times.append(time.monotonic())
+            elif event == "done":
+                done = time.monotonic()
+            elif event == "error":
+                raise RuntimeError(data)
+    return chunk_times, done
+
+
+async def watch_loop(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        before = time.monotonic()
+        await asyncio.sleep(0.01)
+        lags.append(time.monotonic() - before - 0.01)
+
+
+async def main():
+    chat_service.create_graph = lambda **kwargs: FakeAgent()
+    chat_service.compact_chat_memory = SimpleNamespace(delay=lambda *args: None)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        small_csv = os.path.join(tmp, "small.csv")
+        pd.DataFrame({"a": range(100), "b": range(100)}).to_csv(small_csv, index=False)
+        big_csv = os.path.join(tmp, "big.csv")
+        print(f"Writing a {BIG_ROWS:,} row CSV...")
+        rng = np.random.default_rng(0)
+        pd.DataFrame({
+            "x": rng.random(BIG_ROWS),
+            "y": rng.integers(0, 1_000_000, BIG_ROWS),
+            "label": rng.choice(["alpha", "beta", "gamma"], BIG_ROWS),
+        }).to_csv(big_csv, index=False)
+
+        fast_db = make_database(os.path.join(tmp, "fast.db"), small_csv)
+        slow_path = os.path.join(tmp, "slow.db")
+        slow_db = make_database(slow_path, big_csv)
+
+        locked = threading.Event()
+        locker = threading.Thread(target=hold_lock, args=(slow_path, locked))
+        locker.start()
+        locked.wait()
+
+        stop = asyncio.Event()
+        lags = []
+        watcher = asyncio.create_task(watch_loop(stop, lags))
+        started = time.monotonic()
+        slow = asyncio.create_task(consume(slow_db, "Summarize the big dataset"))
+        await asyncio.sleep(0.05)
+        fast = await asyncio.gather(*(consume(fast_db, f"Question {i}") for i in range(FAST_STREAMS)))
+        fast_finished = time.monotonic()
+        slow_chunks, slow_done = await slow
+        stop.set()
+        await watcher
+        locker.join()
+
+    gaps = [b - a for chunks, _ in fast for a, b in zip(chunks, chunks[1:])]
+    print(f"Fast streams: {FAST_STREAMS} x {CHUNKS} chunks done after {fast_finished - started:.2f}s, "
+          f"largest gap between chunks {max(gaps) * 1000:.0f} ms")
+    print(f"Slow stream: first chunk after {slow_chunks[0] - started:.2f}s, done after {slow_done - started:.2f}s")
+    print(f"Event loop: largest stall {max(lags) * 1000:.0f} ms")
+
+    ok = max(lags) < MAX_LOOP_LAG and fast_finished < slow_chunks[0]
+    print("OK: other streams kept flowing" if ok else "FAIL: the event loop was blocked")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -40,8 +40,7 @@ def verify_backend():
         
     print(f"Uploading file: {filename}")
     with open(filename, "rb") as f:
-        files = {"file": (filename, f, "text/csv")}
-        response = requests.post(f"{BASE_URL}/upload/", files=files, headers=headers)
+        response = requests.post(f"{BASE_URL}/upload/", params={"filename": filename}, data=f, headers=headers)
         
     if response.status_code != 202:
         print(f"Upload failed: {response.text}")